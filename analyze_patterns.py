@@ -19,9 +19,10 @@ def analyze_data():
     # For singularities
     all_events = []
 
-    print(f"Total days in dataset: {len(data)}")
+    print(f"Total days in dataset: {sum(1 for info in data.values() if 'meta' in info)}")
 
     for date_str, info in data.items():
+        if 'meta' not in info: continue # 최상위 ml_model 등 날짜가 아닌 키
         meta = info.get('meta', {})
         hourly = info.get('hourly', {})
 
@@ -0,0 +1,114 @@
+import time
+import argparse
+import numpy as np
+
+# ==============================================================================
+# 혼잡도 부트스트랩 신뢰 구간 (방향 x 시간 x 역, 날짜 맥락별)
+# ------------------------------------------------------------------------------
+# predict.js / verify_logic.predict는 비슷한 날 몇 개의 평균 하나만 돌려주므로 퍼짐을 알 수 없습니다.
+# 날짜 맥락 = (요일, 쉬는 날 여부, 날씨) (date_dim의 dow / day_off / weather, predict.js 점수 항목과 같음)
+# 맥락마다 해당 일자들을 복원 추출해서 평균을 n_boot번 다시 계산하고 그 분위수를 구간으로 씁니다.
+#   - 재표본은 인덱스 대신 다항 개수 W [맥락, n_boot, 일자]로 만들고 (bincount 한 번)
+#   - 평균은 W @ 혼잡도 [맥락, 일자, 2 * 20 * 10] 배치 행렬곱 한 번으로 모든 맥락 x 칸을 한꺼번에
+# 결과는 data.json 최상위 "cong_bands" (칸 순서대로 편 정수 배열이라 작음)
+# ==============================================================================
+N_BOOT = 2000
+BAND_LEVEL = 0.9     # 90% 구간 (5% ~ 95% 분위수)
+MIN_POOL_DAYS = 2    # 맥락의 일자가 이보다 적으면 구간을 만들지 않음
+BOOT_SEED = 2024
+BANDS_KEY = "cong_bands"
+
+
+def context_pools(dim, date_idx):
+    """
+    각 일자의 맥락 -> (맥락 라벨 [(dow, day_off, weather)], 맥락별 일자 인덱스 패딩 [C, n_max], 일자 수 [C])
+    """
+    rows = dim.iloc[date_idx]
+    ctx = list(zip(rows['dow'].astype(int), rows['day_off'].astype(int), rows['weather'].astype(str)))
+    labels = sorted(set(ctx))
+    code = np.array([labels.index(c) for c in ctx], dtype=np.int64)
+    sizes = np.bincount(code, minlength=len(labels))
+    keep = sizes >= MIN_POOL_DAYS
+    labels = [c for c, k in zip(labels, keep) if k]
+    order = np.argsort(code, kind='stable')
+    starts = np.concatenate([[0], np.cumsum(sizes)])[:-1]
+    n_max = int(sizes[keep].max()) if keep.any() else 0
+    pools = np.zeros((len(labels), n_max), dtype=np.int64)
+    for i, c in enumerate(np.flatnonzero(keep)):
+        pools[i, :sizes[c]] = order[starts[c]:starts[c] + sizes[c]]
+    return labels, pools, sizes[keep]
+
+
+def resample_counts(sizes, n_boot, n_max, rng):
+    """맥락별 복원 추출 횟수 W [C, n_boot, n_max] (맥락 c는 앞 sizes[c]칸만, 각 행 합 = sizes[c])"""
+    n_ctx = len(sizes)
+    draw = (rng.random((n_ctx, n_boot, n_max)) * sizes[:, None, None]).astype(np.int64)
+    valid = np.arange(n_max) < sizes[:, None, None]
+    flat = (np.arange(n_ctx * n_boot).reshape(n_ctx, n_boot, 1) * n_max + draw)[np.broadcast_to(valid, draw.shape)]
+    return np.bincount(flat, minlength=n_ctx * n_boot * n_max).reshape(n_ctx, n_boot, n_max).astype(np.float32)
+
+
+def bootstrap_bands(values, pools, sizes, n_boot=N_BOOT, level=BAND_LEVEL, seed=BOOT_SEED):
+    """
+    values [D, K] (일자 x 칸), pools [C, n_max], sizes [C]
+    반환: mean [C, K], lo [C, K], hi [C, K] (맥락 평균과 부트스트랩 평균의 (1-level)/2, (1+level)/2 분위수)
+    """
+    values = np.asarray(values, dtype=np.float32)
+    valid = np.arange(pools.shape[1]) < sizes[:, None]
+    X = values[pools] * valid[..., None]                                # [C, n_max, K]
+    mean = X.sum(axis=1) / sizes[:, None]
+
+    W = resample_counts(sizes, n_boot, pools.shape[1], np.random.default_rng(seed))
+    boot = np.matmul(W, X) / sizes[:, None, None].astype(np.float32)    # [C, n_boot, K]
+    lo, hi = np.quantile(boot, [(1 - level) / 2, (1 + level) / 2], axis=1)
+    return mean, lo, hi
+
+
+def build_bands(cong_both, dim, date_idx, directions, hours, stations,
+                n_boot=N_BOOT, level=BAND_LEVEL, seed=BOOT_SEED):
+    """
+    혼잡도 큐브 [방향, D, 시간, 역] + 날짜 차원 -> data.json "cong_bands" 객체
+    directions / hours / stations: 큐브 축 라벨 (data_collector의 DIRECTIONS, SERVICE_HOURS, STATION_MAP 순서)
+    {"level", "n_boot", "directions", "hours", "stations",
+     "contexts": {"dow|day_off|weather": {"n", "mean", "lo", "hi"}}}
+    mean/lo/hi: (방향, 시간, 역) 순서로 편 정수 배열
+    """
+    n_dir, n_days = cong_both.shape[:2]
+    values = cong_both.transpose(1, 0, 2, 3).reshape(n_days, -1)        # [D, 2 * 20 * 10]
+    labels, pools, sizes = context_pools(dim, date_idx)
+    mean, lo, hi = bootstrap_bands(values, pools, sizes, n_boot, level, seed)
+    to_int = lambda a: np.rint(a).astype(np.int64).tolist()
+    return {
+        "level": level,
+        "n_boot": n_boot,
+        "directions": list(directions),
+        "hours": list(hours),
+        "stations": list(stations),
+        "contexts": {
+            f"{dow}|{off}|{weather}": {"n": int(n), "mean": m, "lo": l, "hi": h}
+            for (dow, off, weather), n, m, l, h in zip(labels, sizes, to_int(mean), to_int(lo), to_int(hi))
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="날짜 맥락별 혼잡도 부트스트랩 구간")
+    parser.add_argument("--n-boot", type=int, default=N_BOOT, help="재표본 수")
+    parser.add_argument("--level", type=float, default=BAND_LEVEL, help="구간 신뢰 수준")
+    args = parser.parse_args()
+
+    import data_collector
+    from build_all import load_line_table
+    from date_dim import dim_for_table, date_index
+    table = load_line_table()
+    dates, board, alight = data_collector.build_board_alight(table)
+    cong_both = data_collector.congestion(data_collector.line_load(board, alight))
+    dim = dim_for_table(table)
+    t0 = time.perf_counter()
+    bands = build_bands(cong_both, dim, date_index(dim, dates), data_collector.DIRECTIONS,
+                        data_collector.SERVICE_HOURS, data_collector.STATION_MAP.values(), args.n_boot, args.level)
+    print(f"{len(bands['contexts'])}개 맥락 x {cong_both.shape[0] * cong_both.shape[2] * cong_both.shape[3]}칸 "
+          f"x {args.n_boot}회 재표본: {time.perf_counter() - t0:.2f}s")
+    for ctx, b in list(bands['contexts'].items())[:5]:
+        k = int(np.argmax(b['mean']))
+        print(f"  {ctx} ({b['n']}일) 최대 칸 평균 {b['mean'][k]}% [{b['lo'][k]}, {b['hi'][k]}]")
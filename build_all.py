@@ -0,0 +1,81 @@
+import os
+import time
+from ridership_store import load_ridership, peak_rss_mb
+import data_collector
+import model_generator
+import metrics_generator
+import validate_data
+from date_dim import dim_for_table
+
+# ==============================================================================
+# 통합 빌드: raw_data를 한 번만 적재해서 세 산출물을 같은 테이블로 만듭니다.
+#   - data.json                  (data_collector: 날짜별 혼잡도 + ML 계수표 + 혼잡도 P50/P90/P99 + 부트스트랩 구간)
+#   - assets/model_constants.js  (model_generator: BASE_LOAD / 계수 / 7일 예보)
+#   - assets/ridership_data.js   (metrics_generator: 평일/주말 평균 승하차)
+# 공휴일 / 날씨 / 행사는 date_dim 날짜 차원 테이블 하나를 세 단계가 같이 씁니다.
+# 먼저 validate_data.check_data()로 적재 결과를 검사하고 [ERROR]가 있으면 멈춥니다.
+# 세 파일을 모두 계산한 뒤에 한꺼번에 저장하므로, 중간에 실패하면 아무 파일도
+# 바뀌지 않고 세 파일이 서로 다른 시점의 데이터가 되지 않습니다.
+# 과거 날씨 API만 실패한 경우는 예외로, 네트워크가 필요 없는 data.json / ridership_data.js는
+# 시뮬레이션 날씨로 갱신하고 model_constants.js만 기존 파일을 유지합니다.
+# ==============================================================================
+RAW_DATA_DIR = os.path.join(os.getcwd(), "raw_data")
+
+
+def load_line_table(raw_dir=RAW_DATA_DIR, workers=None):
+    """raw_data 적재 + 역명 정리 (골드라인 10개 역만, 노선 순서대로)"""
+    table = load_ridership(raw_dir, workers=workers)
+    line_stations = list(data_collector.CLEAN_NAME)
+    unknown = sorted(set(table['station'].astype(str)) - set(line_stations))
+    if unknown:
+        print(f"⚠️ 골드라인 역이 아닌 정류장 제외: {', '.join(unknown)}")
+    table = table[table['station'].isin(line_stations)]
+    return table.assign(station=table['station'].cat.set_categories(line_stations))
+
+
+def build_all(raw_dir=RAW_DATA_DIR, workers=None):
+    print("🚀 통합 빌드 시작 (data.json + model_constants.js + ridership_data.js)")
+    t0 = time.time()
+
+    if not validate_data.check_data(raw_dir, workers=workers):
+        print("❌ 데이터 검증 실패로 저장하지 않습니다 (기존 산출물 유지).")
+        return False
+
+    table = load_line_table(raw_dir, workers)
+    if table.empty:
+        print("❌ CSV 파일 없음.")
+        return False
+    print(f"Loaded {len(table)} rows from {table['file'].nunique()} CSV files.")
+
+    # 날씨 API가 실패해도 data.json / ridership_data.js는 갱신합니다 (date_dim의 시드 시뮬레이션 날씨).
+    # 실측 날씨가 필요한 model_constants.js (WEATHER_FACTORS)만 건너뛰고 기존 파일을 유지합니다.
+    history_weather, future_forecast = model_generator.fetch_weather(table)
+    if history_weather is None:
+        print("⚠️ 과거 날씨를 받지 못해 시뮬레이션 날씨로 빌드합니다 (model_constants.js는 기존 파일 유지).")
+
+    # 날짜 차원 테이블 (공휴일 / 과거 날씨 / 행사)은 한 번만 만들어 세 단계가 같이 씀
+    dim = dim_for_table(table, weather=history_weather)
+    data_json = data_collector.build_data_json(table, dim)
+    constants = None
+    if history_weather is not None:
+        constants = model_generator.build_model_constants(table, history_weather, future_forecast, dim)
+    ridership = metrics_generator.build_ridership_data(table, dim)
+
+    data_collector.save_data_json(data_json)
+    if constants is not None:
+        model_generator.save_model_constants(constants)
+    metrics_generator.save_ridership_data(ridership)
+
+    peak = peak_rss_mb()
+    print(f"✅ 통합 빌드 완료 ({time.time() - t0:.1f}s"
+          + (f", peak RSS {peak:.0f} MB)" if peak is not None else ")"))
+    return True
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description="raw_data -> data.json, model_constants.js, ridership_data.js")
+    parser.add_argument("--workers", type=int, default=None, help="파싱 프로세스 수 (기본: CPU 코어 수)")
+    args = parser.parse_args()
+    sys.exit(0 if build_all(workers=args.workers) else 1)
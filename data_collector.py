@@ -1,15 +1,16 @@
 import os
-import pandas as pd
 import json
-import re
-from datetime import datetime
-import random
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import OneHotEncoder
+import hashlib
 import numpy as np
+from ridership_store import load_ridership
+from date_dim import build_date_dim, date_index, WEATHER_CODES
+from model_registry import fingerprint, cached_model
+from quantile_sketch import N_BUCKETS, new_sketch, sketch_add, merge_sketches, sketch_quantiles
+from bootstrap_bands import BANDS_KEY, build_bands
 
 # Configuration
 RAW_DIR = "raw_data"
+OUTPUT_FILE = "data.json"
 STATION_ORDER = [
     "1.양촌", "2.구래", "3.마산", "4.장기", "5.운양", 
     "6.걸포북변", "7.사우(김포시청)", "8.풍무", "9.고촌", "10.김포공항"
@@ -20,251 +21,406 @@ STATION_MAP = {
     "5.운양": "운양", "6.걸포북변": "걸포북변", "7.사우(김포시청)": "사우",
     "8.풍무": "풍무", "9.고촌": "고촌", "10.김포공항": "김포공항"
 }
-
-# Holiday List (2024.12 - 2025.11) - Manual for precision
-HOLIDAYS = [
-    "2024-12-25", # Xmas
-    "2025-01-01", # New Year
-    "2025-01-27", "2025-01-28", "2025-01-29", "2025-01-30", # Seollal
-    "2025-03-01", # Samiljeol
-    "2025-03-03", # Substitute?
-    "2025-05-05", "2025-05-06", # Children/Buddha
-    "2025-06-06", # Memorial
-    "2025-08-15", # Liberation
-    "2025-10-03", # Foundation
-    "2025-10-05", "2025-10-06", "2025-10-07", "2025-10-08", # Chuseok (Approx)
-    "2025-10-09", # Hangeul
-    "2025-12-25"  # Xmas
-]
-
-# User Events
-# Format: (Start, End, Name, StationName)
-EVENTS = [
-    ("2025-04-11", "2025-04-12", "CherryBlossom", "풍무"),
-    ("2025-06-14", "2025-06-17", "AraMarine", "고촌"),
-    ("2025-09-27", "2025-09-27", "Dadam", "운양"),
-    ("2025-10-18", "2025-10-18", "Laveniche", "장기")
-]
+# raw_data 내용상의 역명 -> JSON 역명
+CLEAN_NAME = {name.split('.', 1)[1]: short for name, short in STATION_MAP.items()}
 
 # Train Capacity (2 cars)
 CAPACITY = 350 # Dense capacity
 
-def get_weather_sim(date_str):
-    # Simulate weather based on season 
-    # (Since API blocked, this ensures the CODE LOGIC works)
-    dt = pd.to_datetime(date_str)
-    month = dt.month
-    
-    # Rain/Snow Probability
-    prob = 0.05
-    type_w = "Clear"
-    
-    if month in [7, 8]: # Summer Rain
-        prob = 0.3
-        type_w = "Rain"
-    elif month in [12, 1, 2]: # Winter Snow
-        prob = 0.15
-        type_w = "Snow"
-        
-    if random.random() < prob:
-        return type_w
-    return "Clear"
-
-def train_ml_model(df_train):
-    # Train a simple Linear Regression model per Station & Hour
-    # Features: DoW (0-6), IsHoliday (0/1), Weather (OneHot), Month (1-12)
-    models = {}
-    
-    # Preprocessing
-    # Map weather to numeric
-    weather_map = {"Clear": 0, "Rain": 1, "Snow": 2}
-    
-    # We will build a model for each Station-Hour pair for maximum precision
-    # or a general model. Let's do Station-Hour specific models.
-    
-    stations = df_train['station'].unique()
-    hours = df_train['time'].unique()
-    
-    print("Training ML models...")
-    
-    for st in stations:
-        models[st] = {}
-        st_df = df_train[df_train['station'] == st]
-        
-        for h in hours:
-            h_df = st_df[st_df['time'] == h]
-            if len(h_df) < 5: continue # Not enough data
-            
-            X = []
-            y = []
-            
-            for _, row in h_df.iterrows():
-                dt = pd.to_datetime(row['date'])
-                dow = dt.weekday()
-                is_holiday = 1 if (row['date'] in HOLIDAYS) or (dow >= 5) else 0
-                month = dt.month
-                w_code = weather_map.get(get_weather_sim(row['date']), 0) # Use sim weather consistency
-                
-                X.append([dow, is_holiday, month, w_code])
-                y.append(row['cong'])
-            
-            if not X: continue
-            
-            model = LinearRegression()
-            model.fit(X, y)
-            models[st][h] = model
-            
-    return models
-
-def predict_ml_values(models, date_str, weather_str):
-    # Generate predictions for a given date context
-    preds = {} # { "HH": { "Station": val } }
-    
-    dt = pd.to_datetime(date_str)
-    dow = dt.weekday()
-    is_holiday = 1 if (date_str in HOLIDAYS) or (dow >= 5) else 0
-    month = dt.month
-    weather_map = {"Clear": 0, "Rain": 1, "Snow": 2}
-    w_code = weather_map.get(weather_str, 0)
-    
-    X_input = [[dow, is_holiday, month, w_code]]
-    
-    for st, h_models in models.items():
-        for h, model in h_models.items():
-            pred_cong = model.predict(X_input)[0]
-            pred_cong = max(0, int(round(pred_cong)))
-            
-            if str(h) not in preds: preds[str(h)] = {}
-            preds[str(h)][st] = pred_cong
-            
-    return preds
+# data.json 시간대 (04시 ~ 23시)
+SERVICE_HOURS = list(range(4, 24))
 
-def process_data():
-    # 1. Load Existing Data or Raw?
-    # Requirement: "Manual update process... using collected data"
-    # We will assume we re-process RAW data to build the DB.
-    
-    print("Reading files...")
-    all_rows = []
-    
-    # ... (Same file reading logic as before, condensed for brevity) ...
-    for station_folder in STATION_ORDER:
-        raw_name = STATION_MAP[station_folder]
-        folder_path = os.path.join(RAW_DIR, station_folder)
-        if not os.path.exists(folder_path): continue
-        for f in os.listdir(folder_path):
-            if not (f.endswith('.csv') or f.endswith('.xls')): continue
-            fpath = os.path.join(folder_path, f)
-            try:
-                try: df = pd.read_csv(fpath, encoding='cp949')
-                except: 
-                    try: df = pd.read_csv(fpath, encoding='cp949', header=None, skiprows=1)
-                    except: df = pd.read_excel(fpath)
-                
-                date_col = None
-                for col in df.columns:
-                    if re.search(r'\d{4}-\d{2}-\d{2}', str(df[col].iloc[0])):
-                        date_col = col; break
-                if not date_col and len(df.columns) > 2: date_col = df.columns[2]
-                if not date_col: continue
-
-                for idx, row in df.iterrows():
-                    date_raw = str(row[date_col]).split('(')[0]
-                    try: 
-                        date_obj = pd.to_datetime(date_raw)
-                        date_str = date_obj.strftime("%Y-%m-%d")
-                        if date_obj.year < 2024: continue # Skip junk
-                    except: continue
-                    
-                    for h in range(4, 24):
-                        h_str = f"{h:02d}"
-                        on_col = [c for c in df.columns if h_str in str(c) and '승차' in str(c)]
-                        off_col = [c for c in df.columns if h_str in str(c) and '하차' in str(c)]
-                        on_val, off_val = 0, 0
-                        if on_col: on_val = pd.to_numeric(row[on_col[0]], errors='coerce') or 0
-                        if off_col: off_val = pd.to_numeric(row[off_col[0]], errors='coerce') or 0
-                        
-                        all_rows.append({ "date": date_str, "time": h, "station": raw_name, "on": on_val, "off": off_val })
-            except: pass
-
-    print(f"Loaded {len(all_rows)} rows. Processing...")
-    df_main = pd.DataFrame(all_rows)
+# 운행 방향 -> data.json 키 (predict.js의 direction 값과 같음)
+# hourly: 양촌 -> 김포공항 (기존 키, [{"station", "cong"}] 목록)
+# hourly_yangchon: 김포공항 -> 양촌, 시간마다 혼잡도 정수 배열만 (역 순서는 최상위 YANGCHON_STATIONS_KEY 하나)
+DIRECTIONS = {"김포공항방면": "hourly", "양촌역방면": "hourly_yangchon"}
+YANGCHON_STATIONS_KEY = "hourly_yangchon_stations"
+
+# ML features, taken from the date dimension table (date_dim.build_date_dim)
+# DoW (0-6), IsHoliday (holiday or weekend, 0/1), Month (1-12), Weather code
+ML_FEATURES = ["dow", "day_off", "month", "weather_code"]
+
+# (역, 시간) 그룹에 학습 행이 이보다 적으면 모델을 만들지 않음
+MIN_TRAIN_ROWS = 5
+
+# data.json 최상위 계수표 키 (meta가 없으므로 predict.js의 날짜 순회에서 건너뜀)
+ML_MODEL_KEY = "ml_model"
+# 계수표 소수 자릿수 (예측은 정수로 반올림하므로 6자리면 충분)
+ML_MODEL_DIGITS = 6
+
+def feature_matrix(dim, date_idx):
+    """날짜 차원 -> 설계 행렬 [N, F] (ML_FEATURES 순서, float64)"""
+    return dim[ML_FEATURES].to_numpy(dtype=np.float64)[date_idx]
+
+def solve_linear(xtx, xty):
+    """
+    배치 정규방정식 풀이: xtx [..., F, F], xty [..., F] -> coef [..., F]
+    (중심화된 XᵀX라 특이 행렬이어도 pinv로 최소 노름 해 = sklearn LinearRegression과 같은 해)
+    """
+    return (np.linalg.pinv(xtx, hermitian=True) @ xty[..., None])[..., 0]
+
+def ml_stats(cong, X, weights=None):
+    """
+    (역, 시간)별 충분통계량: 선형회귀 해는 이것만으로 정해집니다.
+    cong [D, H, S], X [D, F], weights: 일자별 가중치 [D] (망각용, None이면 전부 1)
+    반환: {"rows" [S, H] 학습 행 수, "w" [S, H] 가중치 합, "sx" [S, H, F], "sy" [S, H],
+           "sxx" [S, H, F, F], "sxy" [S, H, F]}
+    """
+    Y = np.asarray(cong, dtype=np.float64).transpose(2, 1, 0)           # [S, H, D]
+    W = np.ones(Y.shape) if weights is None else np.broadcast_to(np.asarray(weights, dtype=np.float64), Y.shape)
+    # 3-D 설계 텐서 대신 XᵀX / Xᵀy를 einsum으로 바로 쌓음 (메모리 O(S*H*F^2))
+    return {
+        "rows": np.full(Y.shape[:2], float(Y.shape[2])),
+        "w": W.sum(axis=2),
+        "sx": W @ X,
+        "sy": (W * Y).sum(axis=2),
+        "sxx": np.einsum('shd,df,dg->shfg', W, X, X),
+        "sxy": np.einsum('shd,df->shf', W * Y, X),
+    }
+
+def solve_ml_stats(stats, stations=None):
+    """충분통계량 -> 모델 (그룹별 가중 평균으로 중심화해서 풀고 절편은 따로 계산)"""
+    w = stats['w']
+    safe_w = np.maximum(w, 1e-12)
+    x_mean = stats['sx'] / safe_w[..., None]                            # [S, H, F]
+    y_mean = stats['sy'] / safe_w                                       # [S, H]
+    xtx = stats['sxx'] - w[..., None, None] * x_mean[..., :, None] * x_mean[..., None, :]
+    xty = stats['sxy'] - w[..., None] * x_mean * y_mean[..., None]
+
+    coef = solve_linear(xtx, xty)
+    intercept = y_mean - (coef * x_mean).sum(axis=2)
+    return {
+        "stations": list(stations) if stations is not None else list(STATION_MAP.values()),
+        "hours": list(SERVICE_HOURS),
+        "features": list(ML_FEATURES),
+        "coef": coef,
+        "intercept": intercept,
+        "n": np.rint(stats['rows']).astype(np.int64),
+    }
+
+# ==============================================================================
+# 증분 학습: XᵀX / Xᵀy (충분통계량)를 저장해두고 새 날짜의 행만 더함
+# ------------------------------------------------------------------------------
+# decay < 1이면 지수 망각: 하루 지날 때마다 기존 통계량에 decay를 곱해서 최근 패턴이 더 큰 비중.
+# 이미 반영한 날짜의 특성(날씨/공휴일 등)이나 혼잡도 값이 바뀌었거나 설정이 다르면 전체 이력으로 다시 만듭니다.
+# ==============================================================================
+ML_STATS_FILE = os.path.join(os.getcwd(), ".cache", "ml", "ml_stats.npz")
+ML_DECAY = 1.0 # 1.0 = 망각 없음 (전체 재학습과 같은 해)
+
+def _day_digests(values, axis=0):
+    """일자 축(axis)의 슬라이스별 해시 [D] (반영했던 날짜의 값이 바뀌었는지 확인용)"""
+    values = np.moveaxis(np.asarray(values), axis, 0)
+    return np.array([int.from_bytes(hashlib.blake2b(np.ascontiguousarray(day).tobytes(), digest_size=8).digest(), 'little')
+                     for day in values], dtype=np.uint64)
+
+def load_ml_stats(path=ML_STATS_FILE):
+    """저장된 충분통계량 (없거나 읽을 수 없으면 None)"""
+    try:
+        with np.load(path, allow_pickle=False) as z:
+            return {k: z[k] for k in z.files}
+    except (OSError, ValueError, KeyError):
+        return None
+
+def save_ml_stats(stats, path=ML_STATS_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, **stats)
+    os.replace(tmp, path)
+
+def update_ml_stats(stats, cong, days, X, decay=ML_DECAY):
+    """
+    stats에 새 일자(days, 모두 stats['last']보다 뒤)의 행만 더합니다. stats가 None이면 새로 만듦.
+    망각 가중치는 달력 일수 기준: 마지막 날 = 1, k일 전 = decay**k
+    """
+    days = np.asarray(days, dtype='datetime64[D]')
+    if len(days) == 0:
+        return stats
+    last = days.max()
+    new = ml_stats(cong, X, weights=decay ** (last - days).astype(np.float64))
+    new.update(seen_days=days, seen_x=np.asarray(X, dtype=np.float64), seen_digest=_day_digests(cong),
+               last=np.array(last), decay=np.array(float(decay)))
+    if stats is None:
+        return new
+
+    scale = decay ** float((last - stats['last'].astype('datetime64[D]')).astype(np.int64))
+    for k in ("w", "sx", "sy", "sxx", "sxy"):
+        new[k] = new[k] + scale * stats[k]
+    new['rows'] = new['rows'] + stats['rows']
+    new['seen_days'] = np.concatenate([stats['seen_days'].astype('datetime64[D]'), days])
+    new['seen_x'] = np.concatenate([stats['seen_x'], new['seen_x']])
+    new['seen_digest'] = np.concatenate([stats['seen_digest'], new['seen_digest']])
+    return new
+
+def _stats_usable(stats, days, X, digests, decay, shape):
+    """
+    저장된 통계량을 이어서 쓸 수 있는지 (설정 / 모양 / 이미 반영한 날짜와 그 특성, 혼잡도 값이 그대로인지)
+    정정된 재배포 파일로 예전 날짜의 혼잡도가 바뀌면 전체 이력으로 다시 만듭니다.
+    """
+    if (stats is None or 'seen_digest' not in stats or float(stats['decay']) != float(decay)
+            or stats['sxy'].shape[:2] != shape):
+        return False
+    seen = stats['seen_days'].astype('datetime64[D]')
+    old = days <= stats['last'].astype('datetime64[D]')
+    return (np.array_equal(days[old], seen) and np.array_equal(X[old], stats['seen_x'])
+            and np.array_equal(digests[old], stats['seen_digest']))
+
+def train_ml_incremental(cong, dates, date_idx, dim, path=ML_STATS_FILE, decay=ML_DECAY, stations=None):
+    """
+    저장된 충분통계량에 마지막 학습 이후 날짜만 더하고 계수를 다시 풉니다 (매일 학습 비용 일정).
+    cong [D, H, S], dates: 각 일자 'YYYY-MM-DD' (정렬), date_idx: dim 행
+    """
+    days = np.asarray(dates, dtype='datetime64[D]')
+    X = feature_matrix(dim, date_idx)
+    shape = (cong.shape[2], cong.shape[1])
+
+    stats = load_ml_stats(path)
+    if _stats_usable(stats, days, X, _day_digests(cong), decay, shape):
+        new = days > stats['last'].astype('datetime64[D]')
+        print(f"Training ML models (incremental: {int(new.sum())} new days)...")
+        stats = update_ml_stats(stats, cong[new], days[new], X[new], decay)
+    else:
+        print("Training ML models (full history)...")
+        stats = update_ml_stats(None, cong, days, X, decay)
+    save_ml_stats(stats, path)
+    return solve_ml_stats(stats, stations)
+
+def predict_ml_batch(models, X):
+    """설계 행렬 X [N, F] -> 예측 혼잡도 [N, S, H] (행렬곱 한 번, 반올림 후 0 이상)"""
+    pred = np.einsum('nf,shf->nsh', np.asarray(X, dtype=np.float64), models['coef']) + models['intercept']
+    return np.maximum(np.round(pred), 0).astype(np.int64)
+
+def ml_pred_block(models, dates, X):
+    """
+    모든 일자의 ml_pred를 한 번에: { date: { "HH": { "Station": val } } }
+    학습 행이 MIN_TRAIN_ROWS보다 적은 (역, 시간)은 빠집니다.
+    """
+    pred = predict_ml_batch(models, X).transpose(0, 2, 1).tolist()     # [N, H, S]
+    trained = (models['n'] >= MIN_TRAIN_ROWS).T                        # [H, S]
+    keep = [(str(h), [(st, s_i) for s_i, st in enumerate(models['stations']) if trained[h_i, s_i]])
+            for h_i, h in enumerate(models['hours'])]
+    keep = [(h_i, h, cols) for h_i, (h, cols) in enumerate(keep) if cols]
+
+    block = {}
+    for d, day in zip(dates, pred):
+        block[d] = {h: {st: day[h_i][s_i] for st, s_i in cols} for h_i, h, cols in keep}
+    return block
+
+def export_ml_model(models, direction="김포공항방면"):
+    """
+    학습 결과 -> data.json에 싣는 계수표 (역 x 시간 x 특성 가중치, 수 KB)
+    predict.js(mlFromModel)가 이 표만으로 과거/미래 어느 날짜든 ML 값을 계산합니다.
+    학습 행이 부족한 (역, 시간)은 null.
+    """
+    trained = models['n'] >= MIN_TRAIN_ROWS
+    coef = np.round(models['coef'], ML_MODEL_DIGITS).tolist()
+    intercept = np.round(models['intercept'], ML_MODEL_DIGITS).tolist()
+    return {
+        "direction": direction,
+        "features": list(models['features']),
+        "weather_codes": dict(WEATHER_CODES),
+        "stations": list(models['stations']),
+        "hours": list(models['hours']),
+        "coef": [[c if ok else None for c, ok in zip(cs, oks)] for cs, oks in zip(coef, trained.tolist())],
+        "intercept": [[b if ok else None for b, ok in zip(bs, oks)] for bs, oks in zip(intercept, trained.tolist())],
+    }
+
+def build_board_alight(table):
+    """
+    load_ridership() 테이블 -> (일자 목록, 승차 [D, 20, 10], 하차 [D, 20, 10])
+    축: 일자(정렬) x SERVICE_HOURS x 역(STATION_MAP 순서 = 양촌 -> 김포공항). 없는 칸은 0.
+    (역, 일자, 시간)은 load_ridership()의 중복 정리로 한 행씩만 있습니다.
+    """
+    table = table[table['station'].isin(list(CLEAN_NAME)) & (table['hour'] >= SERVICE_HOURS[0])
+                  & (table['hour'] <= SERVICE_HOURS[-1]) & (table['date'].dt.year >= 2024)]
+
+    day_values = table['date'].to_numpy().astype('datetime64[D]')
+    days, d_idx = np.unique(day_values, return_inverse=True)
+    h_idx = table['hour'].to_numpy().astype(np.intp) - SERVICE_HOURS[0]
+    order = list(STATION_MAP.values())
+    s_idx = table['station'].astype(str).map(CLEAN_NAME).map(order.index).to_numpy()
+
+    shape = (len(days), len(SERVICE_HOURS), len(order))
+    board = np.zeros(shape, dtype=np.int64)
+    alight = np.zeros(shape, dtype=np.int64)
+    board[d_idx, h_idx, s_idx] = table['board'].to_numpy()
+    alight[d_idx, h_idx, s_idx] = table['alight'].to_numpy()
+    return [str(d) for d in days], board, alight
+
+def line_load(board, alight):
+    """
+    방향별 재차 인원 [2, D, 20, 10] (0: 김포공항방면, 1: 양촌역방면, 역 축은 둘 다 STATION_MAP 순서).
+    진행 방향으로 누적하되 0 아래로는 내려가지 않습니다 (load = max(0, load + 승차 - 하차)).
+    0에서 자르는 누적합은 S_k - min(0, min_{j<=k} S_j) 와 같으므로 (S = 승차 - 하차의 누적합)
+    양방향을 쌓아서 모든 일자/시간을 cumsum 두 번으로 한꺼번에 계산합니다.
+    """
+    net = board - alight
+    s = np.cumsum(np.stack([net, net[..., ::-1]]), axis=-1)
+    load = s - np.minimum(np.minimum.accumulate(s, axis=-1), 0)
+    load[1] = load[1][..., ::-1]
+    return load
+
+def congestion(load):
+    """재차 인원 -> 혼잡도(%) (정원 CAPACITY 기준, 400% 초과는 이상치로 0)"""
+    cong = np.round(load / CAPACITY * 100).astype(np.int64)
+    cong[cong > 400] = 0 # Outlier cleaning for training data
+    return cong
+
+# ==============================================================================
+# 혼잡도 분위수 스케치 (방향 x 일자 유형 x 시간 x 역)
+# ------------------------------------------------------------------------------
+# 평균만으로는 "가끔 붐비는" 칸이 안 보이므로 quantile_sketch 버킷 개수를 모아 P50/P90/P99를 냅니다.
+# 스케치는 더하기로 병합되므로 ML 충분통계량처럼 .cache/sketches에 저장해두고
+# 마지막으로 반영한 날 이후의 날짜만 더합니다 (예전 날짜의 값/일자 유형이 바뀌었으면 전체 재구성).
+# ==============================================================================
+SKETCH_FILE = os.path.join(os.getcwd(), ".cache", "sketches", "congestion.npz")
+SKETCH_DAY_TYPES = ["Workday", "Holiday"] # model_generator.DAY_TYPES 와 같은 구분 (dim day_off)
+QUANTILES = (0.5, 0.9, 0.99)
+CONG_QUANTILES_KEY = "cong_quantiles"
+
+def congestion_sketch(cong_both, day_type):
+    """cong_both [2, D, 20, 10], day_type [D] (0: Workday, 1: Holiday) -> 스케치 [2, 2, 20, 10, B]"""
+    n_dir, n_days, n_hours, n_st = cong_both.shape
+    sketch = new_sketch((n_dir, len(SKETCH_DAY_TYPES), n_hours, n_st))
+    d, _, h, s = np.indices(cong_both.shape, sparse=True)
+    keys = np.broadcast_arrays(d, np.asarray(day_type)[None, :, None, None], h, s)
+    return sketch_add(sketch, keys, cong_both)
+
+def _sketch_usable(saved, days, day_type, digests, shape):
+    """저장된 스케치에 이어서 병합할 수 있는지 (모양 / 이미 반영한 날짜와 그 값, 일자 유형이 그대로인지)"""
+    if saved is None or saved['sketch'].shape != shape:
+        return False
+    old = days <= saved['last'].astype('datetime64[D]')
+    return (np.array_equal(days[old], saved['seen_days'].astype('datetime64[D]'))
+            and np.array_equal(day_type[old], saved['seen_type']) and np.array_equal(digests[old], saved['seen_digest']))
+
+def update_congestion_sketch(cong_both, dates, day_type, path=SKETCH_FILE):
+    """저장된 스케치에 새 날짜의 부분 스케치만 병합해서 저장하고 돌려줍니다 (dates: 정렬된 'YYYY-MM-DD')."""
+    days = np.asarray(dates, dtype='datetime64[D]')
+    day_type = np.asarray(day_type, dtype=np.int64)
+    digests = _day_digests(cong_both, axis=1)
+    shape = (cong_both.shape[0], len(SKETCH_DAY_TYPES)) + cong_both.shape[2:] + (N_BUCKETS,)
+    try:
+        with np.load(path, allow_pickle=False) as z:
+            saved = {k: z[k] for k in z.files}
+    except (OSError, ValueError, KeyError):
+        saved = None
+
+    if _sketch_usable(saved, days, day_type, digests, shape):
+        new = days > saved['last'].astype('datetime64[D]')
+        print(f"Merging congestion sketches ({int(new.sum())} new days)...")
+        sketch = merge_sketches(saved['sketch'], congestion_sketch(cong_both[:, new], day_type[new]))
+    else:
+        print("Building congestion sketches (full history)...")
+        sketch = congestion_sketch(cong_both, day_type)
+
+    if len(days):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, sketch=sketch, seen_days=days, seen_type=day_type, seen_digest=digests,
+                 last=np.array(days.max()))
+        os.replace(tmp, path)
+    return sketch
+
+def export_quantiles(sketch):
+    """
+    스케치 -> data.json용 분위수 표
+    {"quantiles": [50, 90, 99], 방향: {일자 유형: {시간: {역: [P50, P90, P99]}}}} (관측 없는 칸은 생략)
+    """
+    q = np.round(sketch_quantiles(sketch, QUANTILES)).tolist()
+    out = {"quantiles": [int(round(p * 100)) for p in QUANTILES], "day_types": SKETCH_DAY_TYPES}
+    station_names = list(STATION_MAP.values())
+    for dir_name, dir_q in zip(DIRECTIONS, q):
+        out[dir_name] = {
+            t: {str(h): {s: [int(v) for v in vals] for s, vals in zip(station_names, h_q) if vals[0] == vals[0]}
+                for h, h_q in zip(SERVICE_HOURS, t_q)}
+            for t, t_q in zip(SKETCH_DAY_TYPES, dir_q)
+        }
+    return out
+
+def build_data_json(table, dim=None, per_date_ml=False, ml_decay=ML_DECAY):
+    """
+    load_ridership() 테이블 -> data.json 객체 (날짜별 meta / hourly + 최상위 ml_model 계수표, cong_quantiles 분위수 표, cong_bands 구간 표)
+    dim: date_dim 날짜 차원 테이블 (None이면 이 날짜들로 새로 만듦, 날씨는 시드 시뮬레이션)
+    per_date_ml: True면 예전처럼 날짜마다 ml_pred도 씀 (계수표로 계산 가능하므로 기본은 생략)
+    ml_decay: ML 충분통계량의 하루 망각 계수 (1.0 = 망각 없음)
+    """
+    dates, board, alight = build_board_alight(table)
+    if dim is None:
+        dim = build_date_dim(dates)
+    date_idx = date_index(dim, dates)
+    meta = dim[["dow", "holiday", "weekend", "weather"]].iloc[date_idx].to_dict('records')
+    print(f"Loaded {board.shape[0]} days x {board.shape[1]} hours x {board.shape[2]} stations. Processing...")
     
     # 2. Calculate Congestion for ML Training
-    training_data = [] # List of dicts
-    
-    dates = df_main['date'].unique()
-    
-    # Helper to calc daily congestion map
-    # We need a structure: Date -> Hour -> Station -> Congestion
-    # to train the model effectively.
-    
-    # Process Line Load logic first
+    # Process Line Load logic first: both directions x [D, 20, 10] at once
+    cong_both = congestion(line_load(board, alight))
+    cong = cong_both[0] # ML은 기존대로 김포공항방면 기준
+    station_names = list(STATION_MAP.values())
+
     final_data = {} 
     
-    # Pre-calculate congestion for all historical points
-    for d in sorted(dates):
-        day_df = df_main[df_main['date'] == d]
-        daily_weather = get_weather_sim(d)
-        
-        # Meta info
-        is_holiday = d in HOLIDAYS
-        dow = pd.to_datetime(d).weekday()
-        is_weekend = dow >= 5
-        
+    for i, d in enumerate(dates):
+        # Meta info (date dimension row)
+        m = meta[i]
         final_data[d] = {
             "meta": {
-                "dow": dow, "holiday": is_holiday, "weekend": is_weekend, "weather": daily_weather
+                "dow": int(m["dow"]), "holiday": bool(m["holiday"]),
+                "weekend": bool(m["weekend"]), "weather": str(m["weather"])
             },
             "hourly": {},
+            "hourly_yangchon": {},
             # "ml_pred": {} # Will fill later
         }
         
-        for h in range(4, 24):
-            hour_df = day_df[day_df['time'] == h]
-            current_load = 0
-            station_res = []
-            
-            for s_name in STATION_MAP.values():
-                s_row = hour_df[hour_df['station'] == s_name]
-                on = s_row.iloc[0]['on'] if not s_row.empty else 0
-                off = s_row.iloc[0]['off'] if not s_row.empty else 0
-                
-                current_load += (on - off)
-                if current_load < 0: current_load = 0
-                cong = int(round((current_load / CAPACITY) * 100))
-                
-                if cong > 400: cong = 0 # Outlier cleaning for training data
-                
-                station_res.append({ "station": s_name, "cong": cong })
-                
-                # Add to training set
-                training_data.append({
-                    "date": d, "time": h, "station": s_name, "cong": cong
-                })
-            
-            final_data[d]["hourly"][h] = station_res
-
-    # 3. Train ML Model
-    train_df = pd.DataFrame(training_data)
-    models = train_ml_model(train_df)
+        for h, row in zip(SERVICE_HOURS, cong_both[0, i].tolist()):
+            final_data[d]["hourly"][h] = [{ "station": s, "cong": c } for s, c in zip(station_names, row)]
+        # 반대 방향은 진행 순서(김포공항 -> 양촌) 정수 배열만
+        for h, row in zip(SERVICE_HOURS, cong_both[1, i, :, ::-1].tolist()):
+            final_data[d]["hourly_yangchon"][h] = row
+    final_data[YANGCHON_STATIONS_KEY] = station_names[::-1]
+
+    # 3. Train ML Model (training set = every date x hour x station of the cube)
+    # 학습 데이터(혼잡도 큐브 + 날짜 특성) / 설정이 지난번과 같으면 저장된 계수를 그대로 씀
+    key = fingerprint(cong, np.asarray(dates), feature_matrix(dim, date_idx),
+                      {"features": ML_FEATURES, "hours": SERVICE_HOURS, "stations": list(STATION_MAP.values()),
+                       "decay": ml_decay})
+    models = cached_model("linear", key, lambda: train_ml_incremental(cong, dates, date_idx, dim, decay=ml_decay))
     
-    # 4. Generate ML Predictions for Every Day (Ensemble Base)
-    # Even for historical days, we store what the ML *would* have predicted given just meta.
-    # This serves as the 'Base' for our application logic.
-    print("Generating ML base predictions...")
+    # 4. ML Base (Ensemble Base): 계수표를 싣고, predict.js가 요청 날짜의 값을 직접 계산
+    # (과거 날짜뿐 아니라 미래 날짜도 meta만 있으면 계산 가능)
+    final_data[ML_MODEL_KEY] = export_ml_model(models)
+
+    # 5. 혼잡도 분위수 (P50/P90/P99): 저장된 스케치에 새 날짜만 병합
+    day_type = dim["day_off"].to_numpy()[date_idx].astype(np.int64)
+    final_data[CONG_QUANTILES_KEY] = export_quantiles(update_congestion_sketch(cong_both, dates, day_type))
+
+    # 6. 날짜 맥락(요일, 쉬는 날, 날씨)별 평균 혼잡도의 부트스트랩 구간
+    final_data[BANDS_KEY] = build_bands(cong_both, dim, date_idx, DIRECTIONS, SERVICE_HOURS, station_names)
+
+    if per_date_ml:
+        # Even for historical days, we store what the ML *would* have predicted given just meta.
+        print("Generating ML base predictions...")
+        # 모든 일자 x 역 x 시간을 날짜 차원 특성 행렬과 계수의 행렬곱 한 번으로
+        for d, preds in ml_pred_block(models, dates, feature_matrix(dim, date_idx)).items():
+            final_data[d]['ml_pred'] = preds
+
+    return final_data
+
+def save_data_json(final_data, path=OUTPUT_FILE):
+    with open(path, "w", encoding='utf-8') as f:
+        json.dump(final_data, f, ensure_ascii=False)
+    print(f"Saved {path} with ML predictions")
+
+def process_data():
+    # 1. Load Existing Data or Raw?
+    # Requirement: "Manual update process... using collected data"
+    # We will assume we re-process RAW data to build the DB.
     
-    for d in final_data:
-        w_str = final_data[d]['meta']['weather']
-        
-        # Generate prediction context
-        preds = predict_ml_values(models, d, w_str)
-        final_data[d]['ml_pred'] = preds
+    print("Reading files...")
+    final_data = build_data_json(load_ridership(RAW_DIR))
 
     # 5. Save
-    with open("data.json", "w", encoding='utf-8') as f:
-        json.dump(final_data, f, ensure_ascii=False)
-    print("Saved data.json with ML predictions")
+    save_data_json(final_data)
 
 if __name__ == "__main__":
     process_data()
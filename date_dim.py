@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import holidays
+
+# ==============================================================================
+# 날짜 차원 테이블 (요일 / 공휴일 / 월 / 날씨 / 행사)
+# ------------------------------------------------------------------------------
+# 실행마다 한 번 build_date_dim()으로 만들고, 각 단계는 행마다 날짜를 다시
+# 해석하지 않고 정수 날짜 인덱스(date_index)로 이 테이블의 컬럼을 가져다 씁니다.
+#   - 공휴일: holidays 패키지 (대체공휴일/선거일 포함, scripts/data_collector.py와 동일)
+#   - 날씨: 과거 관측값(model_generator.fetch_historical_weather)이 있으면 그 값,
+#           없으면 날짜별로 시드를 고정한 계절 시뮬레이션 (실행마다 같은 값)
+# ==============================================================================
+WEATHER_CODES = {"Clear": 0, "Rain": 1, "Snow": 2}
+
+# 날씨 시뮬레이션 시드 (같은 날짜는 항상 같은 날씨)
+WEATHER_SEED = 2024
+
+# User Events
+# Format: (Start, End, Name, StationName)
+EVENTS = [
+    ("2025-04-11", "2025-04-12", "CherryBlossom", "풍무"),
+    ("2025-06-14", "2025-06-17", "AraMarine", "고촌"),
+    ("2025-09-27", "2025-09-27", "Dadam", "운양"),
+    ("2025-10-18", "2025-10-18", "Laveniche", "장기")
+]
+
+
+def korean_holidays(years):
+    """{datetime.date: 이름} (holidays.KR)"""
+    return holidays.KR(years=sorted(set(int(y) for y in years)))
+
+
+def simulated_weather(dates, seed=WEATHER_SEED):
+    """
+    계절별 비/눈 확률로 뽑은 날씨 (API를 못 쓸 때도 코드 경로가 돌도록).
+    7~8월 비 30%, 12~2월 눈 15%, 그 외 달은 'Clear'.
+    날짜마다 (seed, 날짜) 고정 난수를 쓰므로 기간이 늘어도 기존 날짜의 날씨는 그대로입니다.
+    """
+    dates = pd.DatetimeIndex(dates)
+    day_num = dates.values.astype('datetime64[D]').astype(np.int64)
+    draw = np.array([np.random.default_rng([seed, int(n)]).random() for n in day_num])
+
+    month = dates.month.to_numpy()
+    kind = np.where(np.isin(month, [7, 8]), "Rain", np.where(np.isin(month, [12, 1, 2]), "Snow", "Clear"))
+    prob = np.where(kind == "Clear", 0.05, np.where(kind == "Rain", 0.3, 0.15))
+    return np.where(draw < prob, kind, "Clear")
+
+
+def build_date_dim(dates, weather=None, seed=WEATHER_SEED):
+    """
+    dates(정렬된 고유 날짜) -> 날짜 차원 DataFrame (index = 정수 날짜 인덱스 0..D-1)
+    컬럼: date, date_str, dow(월=0), weekend, holiday(공휴일만), day_off(공휴일 또는 주말),
+          month, weather, weather_code, event(행사명, 없으면 ''), event_station
+    weather: {'YYYY-MM-DD': 'Clear'|'Rain'|'Snow'} 과거 날씨 (없는 날짜는 'Clear'), None이면 시뮬레이션
+    """
+    idx = pd.DatetimeIndex(pd.to_datetime(np.asarray(dates, dtype='datetime64[D]')))
+    date_str = idx.strftime("%Y-%m-%d")
+    dow = idx.dayofweek.to_numpy()
+
+    kr = korean_holidays(idx.year.unique()) if len(idx) else {}
+    holiday = np.array([d in kr for d in idx.date], dtype=bool)
+
+    if weather is None:
+        weather_str = simulated_weather(idx, seed)
+    else:
+        weather_str = np.array([weather.get(d, "Clear") for d in date_str])
+
+    event = np.full(len(idx), "", dtype=object)
+    event_station = np.full(len(idx), "", dtype=object)
+    for start, end, name, station in EVENTS:
+        hit = (idx >= pd.Timestamp(start)) & (idx <= pd.Timestamp(end))
+        event[hit] = name
+        event_station[hit] = station
+
+    return pd.DataFrame({
+        "date": idx,
+        "date_str": date_str,
+        "dow": dow,
+        "weekend": dow >= 5,
+        "holiday": holiday,
+        "day_off": holiday | (dow >= 5),
+        "month": idx.month.to_numpy(),
+        "weather": weather_str,
+        "weather_code": pd.Series(weather_str).map(WEATHER_CODES).fillna(0).astype(int).to_numpy(),
+        "event": event,
+        "event_station": event_station,
+    })
+
+
+def date_index(dim, dates):
+    """날짜 배열 -> dim의 정수 날짜 인덱스 (dim에 없는 날짜가 있으면 ValueError)"""
+    keys = dim['date'].to_numpy().astype('datetime64[D]')
+    values = np.asarray(dates).astype('datetime64[D]')
+    pos = np.searchsorted(keys, values)
+    pos_c = np.minimum(pos, len(keys) - 1)
+    if len(values) and (len(keys) == 0 or (keys[pos_c] != values).any()):
+        raise ValueError("date_index: 날짜 차원 테이블에 없는 날짜가 있습니다.")
+    return pos_c
+
+
+def dim_for_table(table, weather=None, seed=WEATHER_SEED):
+    """load_ridership() 테이블의 날짜 범위 전체(빠진 날 포함)에 대한 날짜 차원"""
+    if table.empty:
+        return build_date_dim([], weather, seed)
+    days = np.arange(table['date'].min().to_datetime64().astype('datetime64[D]'),
+                     table['date'].max().to_datetime64().astype('datetime64[D]') + 1)
+    return build_date_dim(days, weather, seed)
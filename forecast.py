@@ -0,0 +1,195 @@
+import time
+import argparse
+import itertools
+import numpy as np
+
+# ==============================================================================
+# Holt-Winters (가법, 주간 계절 7일, 감쇠 추세) 일괄 예측
+# ------------------------------------------------------------------------------
+# [series, days] 행렬의 모든 시계열을 한꺼번에 평활합니다. 파이썬 루프는 날짜 축 하나뿐이고
+# 시계열 축과 (alpha, beta, gamma) 후보 축은 NumPy 브로드캐스트로 처리하므로
+# 시계열이 수천 개가 되어도 매일 다시 맞출 수 있습니다.
+#   - 후보 고르기: 마지막 CV_DAYS일 안의 여러 시점(CV_HORIZON일 간격)에서 그때까지의 상태로
+#     CV_HORIZON일을 예측해 본 절대 오차 (rolling-origin). 1스텝 SSE는 과적합된 후보를 고르기 쉬움
+#   - 같은 시점들에서 "지난주 그대로"(계절 naive)가 더 나은 시계열은 그 예측으로 대체
+#   - 연간 계절성: 1년치 데이터로는 추정할 수 없으므로, 월별 계수(model_generator의
+#     SEASON_FACTORS 등)를 주면 그 계수로 나눈 값을 평활하고 예측에 다시 곱합니다.
+# 기본 시계열: data_collector 혼잡도 큐브의 (방향, 시간, 역) = 2 x 20 x 10 = 400개
+# ==============================================================================
+SEASON = 7
+ALPHAS = (0.05, 0.1, 0.2, 0.4)
+BETAS = (0.0, 0.01, 0.05)
+GAMMAS = (0.05, 0.15, 0.3)
+DAMPING = 0.98
+CV_HORIZON = 14  # rolling-origin 검증에서 한 시점마다 예측하는 일수
+CV_DAYS = 140    # 검증 시점을 두는 마지막 구간 (CV_HORIZON일 간격, 20주)
+
+
+def param_grid(alphas=ALPHAS, betas=BETAS, gammas=GAMMAS):
+    """후보 (alpha, beta, gamma) [P, 3]"""
+    return np.array(list(itertools.product(alphas, betas, gammas)), dtype=np.float64)
+
+
+def cv_origins(n_days, season=SEASON, horizon=CV_HORIZON, cv_days=CV_DAYS):
+    """rolling-origin 검증 시점 (그 날짜부터 horizon일을 예측, 초기화 2주 뒤부터)"""
+    return [t for t in range(n_days - cv_days, n_days - horizon + 1, horizon) if t >= 2 * season]
+
+
+def _smooth(Y, params, season, phi, origins=(), horizon=CV_HORIZON):
+    """
+    Y [S, D] 를 후보 파라미터 [P, 3] 전부로 평활.
+    origins: 이 날짜들에서 그 전까지의 상태로 horizon일을 예측해서 절대 오차를 더함
+    반환: level [P, S], trend [P, S], seasonal [P, S, m] (인덱스 = 날짜 % m), sse [P, S], cv [P, S]
+    """
+    n_days = Y.shape[1]
+    alpha, beta, gamma = (params[:, i, None] for i in range(3))        # [P, 1]
+
+    # 초기값: 첫 주 평균 = 수준, 둘째 주와의 차이 / m = 추세, 첫 주 - 평균 = 계절
+    first = Y[:, :season].mean(axis=1)
+    second = Y[:, season:2 * season].mean(axis=1)
+    level = np.broadcast_to(first, (len(params), len(first))).copy()
+    trend = np.broadcast_to((second - first) / season, level.shape).copy()
+    seasonal = np.broadcast_to(Y[:, :season] - first[:, None], level.shape + (season,)).copy()
+    sse = np.zeros(level.shape)
+    cv = np.zeros(level.shape)
+    steps = np.arange(1, horizon + 1)
+    damp = np.cumsum(phi ** steps)
+    origins = set(origins)
+
+    for t in range(season, n_days):
+        if t in origins:
+            ahead = (level[..., None] + damp * trend[..., None]
+                     + seasonal[..., (t - 1 + steps) % season])              # [P, S, horizon]
+            cv += np.abs(Y[:, t:t + horizon] - ahead).sum(axis=2)
+        k = t % season
+        y = Y[:, t]
+        s_prev = seasonal[..., k]
+        damped = level + phi * trend
+        err = y - (damped + s_prev)
+        sse += err * err
+        new_level = damped + alpha * err
+        trend = beta * (new_level - level) + (1 - beta) * phi * trend
+        seasonal[..., k] = s_prev + gamma * (y - new_level - s_prev)
+        level = new_level
+    return level, trend, seasonal, sse, cv
+
+
+def naive_cv(Y, origins, season=SEASON, horizon=CV_HORIZON):
+    """같은 검증 시점에서 계절 naive (지난 season일 반복)의 절대 오차 합 [S]"""
+    cv = np.zeros(Y.shape[0])
+    for t in origins:
+        cv += np.abs(Y[:, t:t + horizon] - Y[:, t - season + (np.arange(horizon) % season)]).sum(axis=1)
+    return cv
+
+
+def fit_holt_winters(Y, season=SEASON, params=None, phi=DAMPING):
+    """
+    시계열 행렬 Y [S, D] (D >= 2 * season) -> 상태
+    {"level" [S], "trend" [S], "seasonal" [S, m], "params" [S, 3], "sse" [S],
+     "cv" [S], "naive_cv" [S], "naive" [S] (계절 naive로 대체), "last_season" [S, m], "n_days", "season", "phi"}
+    검증 시점이 없을 만큼 짧으면 1스텝 SSE로 고르고 naive 대체도 하지 않습니다.
+    """
+    Y = np.asarray(Y, dtype=np.float64)
+    if Y.ndim != 2 or Y.shape[1] < 2 * season:
+        raise ValueError(f"fit_holt_winters: [series, days] 행렬에 최소 {2 * season}일이 필요합니다.")
+    params = param_grid() if params is None else np.asarray(params, dtype=np.float64)
+
+    origins = cv_origins(Y.shape[1], season)
+    level, trend, seasonal, sse, cv = _smooth(Y, params, season, phi, origins)
+    best = (cv if origins else sse).argmin(axis=0)                      # [S]
+    cols = np.arange(Y.shape[0])
+    naive_err = naive_cv(Y, origins, season)
+    return {
+        "level": level[best, cols],
+        "trend": trend[best, cols],
+        "seasonal": seasonal[best, cols],
+        "params": params[best],
+        "sse": sse[best, cols],
+        "cv": cv[best, cols],
+        "naive_cv": naive_err,
+        "naive": (naive_err < cv[best, cols]) if origins else np.zeros(Y.shape[0], dtype=bool),
+        "last_season": Y[:, -season:],
+        "n_days": Y.shape[1],
+        "season": season,
+        "phi": phi,
+    }
+
+
+def forecast_holt_winters(state, horizon):
+    """상태 -> 마지막 날 다음 horizon일 예측 [S, horizon] (naive 시계열은 마지막 season일 반복)"""
+    steps = np.arange(1, horizon + 1)
+    damp = np.cumsum(state['phi'] ** steps)                             # sum_{i=1..h} phi^i
+    k = (state['n_days'] - 1 + steps) % state['season']
+    hw = state['level'][:, None] + damp[None, :] * state['trend'][:, None] + state['seasonal'][:, k]
+    naive = state['last_season'][:, (steps - 1) % state['season']]
+    return np.where(state['naive'][:, None], naive, hw)
+
+
+def forecast_series(Y, horizon, dates=None, month_factors=None, season=SEASON, params=None, phi=DAMPING):
+    """
+    [S, D] -> 다음 horizon일 예측 [S, horizon] (0 이상), 한 번의 호출로 전부.
+    month_factors: {월(1~12): 계수} 연간 계절 계수 (dates 필요, 없으면 주간 계절만)
+    """
+    Y = np.asarray(Y, dtype=np.float64)
+    if month_factors is not None:
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        table = np.array([float(month_factors.get(m, month_factors.get(str(m), 1.0)) or 1.0)
+                          for m in range(1, 13)])
+        month = lambda d: d.astype('datetime64[M]').astype(np.int64) % 12   # 0 = 1월
+        future = dates[-1] + np.arange(1, horizon + 1)
+        pred = forecast_holt_winters(fit_holt_winters(Y / table[month(dates)], season, params, phi), horizon)
+        pred = pred * table[month(future)]
+    else:
+        pred = forecast_holt_winters(fit_holt_winters(Y, season, params, phi), horizon)
+    return np.maximum(pred, 0)
+
+
+def congestion_series(table):
+    """
+    load_ridership() 테이블 -> (일자 목록, 혼잡도 시계열 [2 * 20 * 10, D], 시계열 라벨 [(방향, 시간, 역)])
+    data_collector와 같은 재차 인원 / 혼잡도 계산 (방향: 김포공항방면, 양촌역방면)
+    """
+    import data_collector
+    dates, board, alight = data_collector.build_board_alight(table)
+    cong = data_collector.congestion(data_collector.line_load(board, alight))      # [2, D, 20, 10]
+    series = cong.transpose(0, 2, 3, 1).reshape(-1, cong.shape[1])
+    labels = list(itertools.product(data_collector.DIRECTIONS, data_collector.SERVICE_HOURS,
+                                    data_collector.STATION_MAP.values()))
+    return dates, series, labels
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="(방향, 시간, 역)별 혼잡도 Holt-Winters 일괄 예측")
+    parser.add_argument("--days", type=int, default=7, help="예측 일수")
+    parser.add_argument("--holdout", type=int, default=28, help="정확도 확인용으로 마지막 N일을 빼고 맞춤 (0이면 생략)")
+    parser.add_argument("--bench-series", type=int, default=0, help="합성 시계열 N개로 속도만 측정")
+    args = parser.parse_args()
+
+    if args.bench_series:
+        rng = np.random.default_rng(0)
+        weekly = np.tile(rng.gamma(2.0, 30.0, (args.bench_series, 7)), 53)[:, :365]
+        Y = np.maximum(weekly + rng.normal(0, 10, weekly.shape), 0)
+        t0 = time.perf_counter()
+        pred = forecast_series(Y, args.days)
+        print(f"{args.bench_series}개 시계열 x 365일 -> {args.days}일 예측: {time.perf_counter() - t0:.2f}s")
+    else:
+        from build_all import load_line_table
+        dates, Y, labels = congestion_series(load_line_table())
+        if args.holdout:
+            t0 = time.perf_counter()
+            train, actual = Y[:, :-args.holdout], Y[:, -args.holdout:]
+            state = fit_holt_winters(train)
+            pred = np.maximum(forecast_holt_winters(state, args.holdout), 0)
+            t_fit = time.perf_counter() - t0
+            hw_only = np.maximum(forecast_holt_winters(dict(state, naive=np.zeros_like(state['naive'])), args.holdout), 0)
+            naive = forecast_holt_winters(dict(state, naive=np.ones_like(state['naive'])), args.holdout)
+            mae = lambda p: np.abs(p - actual).mean()
+            print(f"{Y.shape[0]}개 시계열, 마지막 {args.holdout}일 검증 ({t_fit * 1000:.0f} ms): "
+                  f"MAE {mae(pred):.2f} (Holt-Winters만: {mae(hw_only):.2f}, 지난주 그대로: {mae(naive):.2f}, "
+                  f"지난주 그대로 선택 {int(state['naive'].sum())}개)")
+        t0 = time.perf_counter()
+        pred = forecast_series(Y, args.days)
+        print(f"{dates[-1]} 다음 {args.days}일 예측 ({time.perf_counter() - t0:.2f}s)")
+        for i in np.argsort(pred.max(axis=1))[::-1][:5]:
+            direction, hour, station = labels[i]
+            print(f"  {direction} {hour:02d}시 {station}: {np.round(pred[i]).astype(int).tolist()}")
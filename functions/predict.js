@@ -12,6 +12,28 @@ const FALLBACK_DB = {
     // We don't populate full data here, but use a flag to trigger heuristic logic
 };
 
+// ML base value from the coefficient table (data.json "ml_model", built by data_collector.py)
+// Linear model: intercept + sum(coef * feature)
+// Features: dow (Mon=0), day_off (holiday or weekend), month (1-12), weather code
+function mlFromModel(model, dateVal, hour, station, weather, isHoliday) {
+    const stIdx = model.stations.findIndex(s => s === station || station.startsWith(s));
+    const hIdx = model.hours.indexOf(hour);
+    if (stIdx < 0 || hIdx < 0) return null;
+    const w = model.coef[stIdx][hIdx];
+    if (!w) return null;
+
+    const date = new Date(dateVal);
+    if (isNaN(date.getTime())) return null;
+    const x = {
+        dow: (date.getUTCDay() + 6) % 7,
+        day_off: isHoliday ? 1 : 0,
+        month: date.getUTCMonth() + 1,
+        weather_code: model.weather_codes[weather] ?? 0,
+    };
+    const val = model.features.reduce((acc, f, i) => acc + w[i] * x[f], model.intercept[stIdx][hIdx]);
+    return Math.max(0, Math.round(val));
+}
+
 export async function onRequest(context) {
     const { request } = context;
     const url = new URL(request.url);
@@ -97,8 +119,25 @@ export async function onRequest(context) {
         let count = 0;
         let similarDays = [];
         let mlVal = null;
+        let quantiles = null;
+        let band = null;
         let routeSegments = [];
 
+        // Direction: data.json keeps both directions side by side
+        // (hourly = 김포공항방면 [{station, cong}] lists,
+        //  hourly_yangchon = 양촌역방면 plain cong arrays in db.hourly_yangchon_stations order;
+        //  older files only have hourly)
+        const isYangchonBound = direction === "양촌역방면";
+        const yangchonStations = db.hourly_yangchon_stations;
+        const hourlyOf = (dayData) => {
+            if (!isYangchonBound || !dayData.hourly_yangchon || !yangchonStations) return dayData.hourly;
+            const out = {};
+            for (const [h, congs] of Object.entries(dayData.hourly_yangchon)) {
+                out[h] = congs.map((cong, i) => ({ station: yangchonStations[i], cong }));
+            }
+            return out;
+        };
+
         if (db.EMERGENCY_MODE) {
             // --- EMERGENCY HEURISTIC ---
             // Peak: 7-9am (250%), 18-20pm (200%)
@@ -112,9 +151,9 @@ export async function onRequest(context) {
             // Adjust for station position (Sequence: Yangchon -> Gimpo Airport)
             const stations = ["양촌", "구래", "마산", "장기", "운양", "걸포북변", "사우", "풍무", "고촌", "김포공항"];
             const stIdx = stations.indexOf(station.replace('역', ''));
-            // Traffic accumulates towards airport
+            // Traffic accumulates towards the terminus of the chosen direction
             if (stIdx > -1) {
-                const factor = (stIdx + 1) / stations.length;
+                const factor = (isYangchonBound ? stations.length - stIdx : stIdx + 1) / stations.length;
                 finalCong = Math.round(finalCong * factor * 1.2);
             }
 
@@ -162,8 +201,9 @@ export async function onRequest(context) {
             let totalCong = 0;
             // Calculate station specific congestion
             top5.forEach(item => {
-                if (item.data.hourly && item.data.hourly[String(timeVal)]) {
-                    const hourlyData = item.data.hourly[String(timeVal)];
+                const itemHourly = hourlyOf(item.data);
+                if (itemHourly && itemHourly[String(timeVal)]) {
+                    const hourlyData = itemHourly[String(timeVal)];
                     const stData = hourlyData.find(s =>
                         s.station === station || s.station === station.replace('역', '') || station.startsWith(s.station)
                     );
@@ -178,8 +218,9 @@ export async function onRequest(context) {
             });
 
             // Route visualization
-            if (top5.length > 0 && top5[0].data.hourly && top5[0].data.hourly[String(timeVal)]) {
-                const bestHourParams = top5[0].data.hourly[String(timeVal)];
+            const bestHourly = top5.length > 0 ? hourlyOf(top5[0].data) : null;
+            if (bestHourly && bestHourly[String(timeVal)]) {
+                const bestHourParams = bestHourly[String(timeVal)];
                 if (bestHourParams) {
                     routeSegments = bestHourParams.map(s => ({
                         station: s.station,
@@ -192,19 +233,46 @@ export async function onRequest(context) {
             const avgCong = count > 0 ? Math.round(totalCong / count) : 0;
             finalCong = avgCong;
 
-            // Ensemble ML
-            if (db[dateVal] && db[dateVal].ml_pred && db[dateVal].ml_pred[String(timeVal)]) {
+            // Ensemble ML: data_collector trains on 김포공항방면 only (per-date ml_pred and
+            // ml_model are both that direction), so 양촌역방면 requests use the similar-day average alone.
+            // Older data.json files carry per-date ml_pred; newer ones ship the coefficient table
+            const cleanStation = station.replace('역', '');
+            if (!isYangchonBound && db[dateVal] && db[dateVal].ml_pred && db[dateVal].ml_pred[String(timeVal)]) {
                 const mlHourData = db[dateVal].ml_pred[String(timeVal)];
-                const cleanStation = station.replace('역', '');
                 const matchedKey = Object.keys(mlHourData).find(k => k === cleanStation || cleanStation.startsWith(k));
                 if (matchedKey) {
                     mlVal = mlHourData[matchedKey];
                 }
+            } else if (!isYangchonBound && db.ml_model && db.ml_model.direction === "김포공항방면") {
+                // Works for any date, including future ones
+                mlVal = mlFromModel(db.ml_model, dateVal, timeVal, cleanStation, targetWeather, isTargetHoliday);
             }
 
             if (mlVal !== null) {
                 finalCong = Math.round((mlVal * 0.6) + (avgCong * 0.4));
             }
+
+            // Congestion spread for this (direction, day type, hour, station): data.json "cong_quantiles"
+            const cq = db.cong_quantiles && db.cong_quantiles[direction || "김포공항방면"];
+            const cqHour = cq && cq[isTargetHoliday ? "Holiday" : "Workday"]?.[String(timeVal)];
+            if (cqHour) {
+                const qKey = Object.keys(cqHour).find(k => k === cleanStation || cleanStation.startsWith(k));
+                if (qKey) {
+                    quantiles = {};
+                    db.cong_quantiles.quantiles.forEach((q, i) => { quantiles[`p${q}`] = cqHour[qKey][i]; });
+                }
+            }
+
+            // Bootstrap band of the mean for this day context (data.json "cong_bands", key "dow|day_off|weather")
+            const cb = db.cong_bands;
+            const ctxBand = cb && cb.contexts[`${(targetDow + 6) % 7}|${isTargetHoliday ? 1 : 0}|${targetWeather}`];
+            const dirIdx = cb ? cb.directions.indexOf(direction || "김포공항방면") : -1;
+            const hourIdx = cb ? cb.hours.indexOf(timeVal) : -1;
+            const stIdx = cb ? cb.stations.findIndex(k => k === cleanStation || cleanStation.startsWith(k)) : -1;
+            if (ctxBand && dirIdx >= 0 && hourIdx >= 0 && stIdx >= 0) {
+                const i = (dirIdx * cb.hours.length + hourIdx) * cb.stations.length + stIdx;
+                band = { level: cb.level, days: ctxBand.n, mean: ctxBand.mean[i], lo: ctxBand.lo[i], hi: ctxBand.hi[i] };
+            }
         }
 
         // =========================================================================
@@ -293,6 +361,8 @@ export async function onRequest(context) {
                     score: similarDays[0]?.score || 0,
                     ml_pred: mlVal,
                     knn_pred: finalCong,
+                    cong_quantiles: quantiles,
+                    band: band,
                     source: db.EMERGENCY_MODE ? "EMERGENCY_FALLBACK" : "LIVE_DB"
                 },
                 tip: tipData,
@@ -0,0 +1,146 @@
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from date_dim import korean_holidays
+
+# ==============================================================================
+# STCIS 형식 합성 데이터 생성기 (규모 테스트용)
+# ------------------------------------------------------------------------------
+# raw_data/와 같은 레이아웃으로 CSV를 씁니다.
+#   - 폴더: "<번호>.<역명>/", 파일: "노선·정류장 지표(정류장별 이용량)_<export일> (<n>).csv"
+#   - cp949, LF, 모든 줄 끝에 쉼표, 헤더 "정류장명,정류장번호,일자,04(승차),04(하차),...,03(하차),"
+#   - 정류장명 "<역명> [김포골드라인]", 정류장번호 "~", 일자 "YYYY-MM-DD(요일)"
+# 승하차 수는 역 위치(양촌 쪽 주거지 <-> 김포공항 환승), 평일 출퇴근 피크,
+# 주말/공휴일의 낮 시간대 완만한 분포, 계절 요인을 곱한 기대값에서 포아송으로 뽑습니다.
+#
+# 예) 10배: python generate_synthetic_data.py --stations 20 --years 5
+#     적재: python ridership_store.py --raw-dir .cache/synthetic/raw --cache-dir .cache/synthetic/store
+# ==============================================================================
+OUTPUT_DIR = os.path.join(os.getcwd(), ".cache", "synthetic", "raw")
+
+LINE_STATIONS = ["양촌", "구래", "마산", "장기", "운양", "걸포북변", "사우(김포시청)", "풍무", "고촌", "김포공항"]
+# 실제 raw_data(2024.12~2025.11) 평일 하루 평균 승차 인원 (가상역은 이 분포에서 뽑음)
+LINE_DAILY_BOARD = [510, 10015, 3010, 8208, 6028, 5364, 7892, 5664, 5531, 2491]
+LINE_SUFFIX = " [김포골드라인]"
+FILE_PREFIX = "노선·정류장 지표(정류장별 이용량)"
+DOW_KO = ["월", "화", "수", "목", "금", "토", "일"]
+
+# STCIS 시간대 순서: 04시 ~ 23시, 00시 ~ 03시
+HOURS = [(4 + i) % 24 for i in range(24)]
+HEADER = ["정류장명", "정류장번호", "일자"] + [
+    f"{h:02d}({kind})" for h in HOURS for kind in ("승차", "하차")] + [""]
+
+# 04시(첫차) 분포 배율: 실제 raw_data 04시 승차 비율(약 0.03%)에 맞춘 값
+FIRST_HOUR_SCALE = 0.04
+
+
+def station_names(n_stations):
+    """앞 10개는 실제 골드라인 역, 그 뒤는 가상역"""
+    names = LINE_STATIONS[:n_stations]
+    names += [f"가상{i:03d}" for i in range(len(names) + 1, n_stations + 1)]
+    return names
+
+
+def holiday_mask(dates):
+    """dates(datetime64[D]) 중 공휴일(주말 제외) 여부 (date_dim과 같은 holidays.KR 달력)"""
+    dates = pd.DatetimeIndex(dates)
+    kr = korean_holidays(dates.year)
+    return np.array([d in kr for d in dates.date], dtype=bool)
+
+
+def _bump(center, width):
+    hours = np.array(HOURS, dtype=np.float64)
+    hours[hours < 4] += 24  # 00~03시는 전날 밤의 연장
+    # 01~03시는 운행하지 않음, 04시는 첫차 시간대라 승차가 조금 있음
+    scale = np.where(np.isin(HOURS, [1, 2, 3]), 0.0, np.where(np.array(HOURS) == 4, FIRST_HOUR_SCALE, 1.0))
+    return np.exp(-0.5 * ((hours - center) / width) ** 2) * scale
+
+
+def hourly_profiles():
+    """
+    시간대 분포 [일자유형(0=평일, 1=휴일), 방향(0=출근형, 1=퇴근형), 24]
+    출근형: 아침 피크가 큰 흐름 (주거지 승차 / 업무지 하차), 퇴근형은 그 반대
+    """
+    # 계수는 실제 raw_data 평일 시간대별 승차 비율에 맞춘 값
+    am, pm = _bump(7.4, 1.2), _bump(17.5, 1.2)
+    base = _bump(14.0, 5.0) + 0.1 * _bump(22.0, 1.2)
+    weekday = np.stack([0.3 * base + 1.3 * am + 0.1 * pm, 0.3 * base + 0.2 * am + 0.3 * pm])
+    holiday = np.stack([_bump(14.0, 4.0) + 0.15 * _bump(19.0, 2.0) + 0.05 * _bump(7.5, 1.0)] * 2)
+    profiles = np.stack([weekday, holiday])
+    return profiles / profiles.sum(axis=2, keepdims=True)
+
+
+def expected_counts(dates, n_stations, rng):
+    """
+    (일자, 역, 시간, 승/하차) 기대값 [D, S, 24, 2]
+    - 역 위치 p(0=양촌, 1=김포공항): 승차는 양촌 쪽이 출근형, 하차는 김포공항 쪽이 출근형
+    - 역 규모: 골드라인 10개 역은 실제 평일 평균, 가상역은 그 로그정규 분포에서
+    - 휴일(주말+공휴일)은 평일의 약 65%, 여름/겨울은 조금 적게
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    dow = (dates.astype(np.int64) + 3) % 7  # 1970-01-01 = 목요일
+    off = (dow >= 5) | holiday_mask(dates)
+    month = pd.DatetimeIndex(dates).month.to_numpy()
+    season = 1.0 - 0.08 * np.isin(month, [1, 2, 7, 8]) + 0.04 * np.isin(month, [3, 4, 5, 9, 10])
+    day_scale = season * np.where(off, 0.65, 1.0) * np.where(dow == 4, 1.05, 1.0)
+
+    pos = np.linspace(0.0, 1.0, n_stations) if n_stations > 1 else np.zeros(1)
+    real = np.log(LINE_DAILY_BOARD)
+    size = np.exp(rng.normal(real.mean(), real.std(), n_stations))
+    size[:min(n_stations, len(real))] = LINE_DAILY_BOARD[:n_stations]
+
+    profiles = hourly_profiles()[off.astype(int)]  # [D, 2(방향), 24]
+    w_board = (1 - pos)[None, :, None]             # 출근형 비중
+    w_alight = pos[None, :, None]
+    board = w_board * profiles[:, None, 0] + (1 - w_board) * profiles[:, None, 1]
+    alight = w_alight * profiles[:, None, 0] + (1 - w_alight) * profiles[:, None, 1]
+
+    scale = (day_scale[:, None] * size[None, :])[:, :, None]
+    return np.stack([board * scale, alight * scale], axis=3)
+
+
+def generate(out_dir=OUTPUT_DIR, n_stations=10, years=1.0, start="2024-12-01",
+             days_per_file=14, export_date=None, seed=0):
+    """합성 CSV를 out_dir에 씁니다. 반환: (파일 수, 원본 행 수)"""
+    rng = np.random.default_rng(seed)
+    n_days = max(1, int(round(365 * years)))
+    dates = np.datetime64(start, 'D') + np.arange(n_days)
+    export = (export_date or (pd.Timestamp(dates[-1]) + pd.Timedelta(days=12)).strftime("%Y%m%d"))
+
+    counts = rng.poisson(expected_counts(dates, n_stations, rng)).astype(np.int32)  # [D, S, 24, 2]
+    date_labels = np.array([f"{d}({DOW_KO[w]})" for d, w in zip(dates, (dates.astype(np.int64) + 3) % 7)])
+
+    n_files = 0
+    for s, name in enumerate(station_names(n_stations)):
+        folder = os.path.join(out_dir, f"{s + 1}.{name}")
+        os.makedirs(folder, exist_ok=True)
+        for k, lo in enumerate(range(0, n_days, days_per_file), start=1):
+            hi = min(lo + days_per_file, n_days)
+            df = pd.DataFrame(counts[lo:hi, s].reshape(hi - lo, -1), columns=HEADER[3:-1])
+            df.insert(0, HEADER[2], date_labels[lo:hi])
+            df.insert(0, HEADER[1], "~")
+            df.insert(0, HEADER[0], name + LINE_SUFFIX)
+            df[""] = ""
+            path = os.path.join(folder, f"{FILE_PREFIX}_{export} ({k}).csv")
+            df.to_csv(path, index=False, encoding='cp949', lineterminator="\n")
+            n_files += 1
+    return n_files, n_days * n_stations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="STCIS 형식 합성 승하차 CSV 생성")
+    parser.add_argument("--out", default=OUTPUT_DIR, help="출력 폴더 (기본: .cache/synthetic/raw)")
+    parser.add_argument("--stations", type=int, default=10, help="역 수 (기본 10, 10개 초과분은 가상역)")
+    parser.add_argument("--years", type=float, default=1.0, help="기간(년)")
+    parser.add_argument("--start", default="2024-12-01", help="시작 일자")
+    parser.add_argument("--days-per-file", type=int, default=14, help="파일 하나에 담을 일수 (STCIS 기본 14)")
+    parser.add_argument("--export-date", default=None, help="파일명 export 날짜 YYYYMMDD (기본: 마지막 일자 + 12일)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    t0 = time.time()
+    n_files, n_rows = generate(args.out, args.stations, args.years, args.start,
+                               args.days_per_file, args.export_date, args.seed)
+    print(f"✅ {args.out}: 파일 {n_files}개, {n_rows}행 ({n_rows * 24}개 시간대) - {time.time() - t0:.1f}s")
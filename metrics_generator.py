@@ -1,96 +1,35 @@
 import os
-import glob
-import pandas as pd
 import json
-import re
+import numpy as np
+from ridership_store import load_ridership
+from date_dim import dim_for_table, date_index
 
 # Configuration
-RAW_DATA_DIR = r"C:\Users\박남순\OneDrive\Desktop\gimpo-goldline\raw_data"
+RAW_DATA_DIR = os.path.join(os.getcwd(), "raw_data")
+OUTPUT_FILE = os.path.join(os.getcwd(), "assets", "ridership_data.js")
 OUTPUT_FILE_DESKTOP = r"C:\Users\박남순\OneDrive\Desktop\gimpo-goldline\assets\ridership_data.js"
 OUTPUT_FILE_WORKSPACE = r"c:/Users/박남순/.gemini/antigravity/playground/photonic-cassini/gimpo-goldline/assets/ridership_data.js"
 
-def parse_ridership():
-    print("Starting Ridership Analysis...")
-    
+def build_ridership_data(table, dim=None):
+    """
+    load_ridership() 테이블 -> RIDERSHIP_DATA 객체 (역 -> 평일/주말 -> 시간 -> 평균 승하차)
+    dim: date_dim 날짜 차원 테이블 (None이면 테이블 날짜 범위로 새로 만듦)
+    """
     # Storage: { "Station": { "Weekday": { h: {b: sum, a: sum, count: n} }, "Weekend": ... } }
     agg_data = {}
 
-    csv_files = glob.glob(os.path.join(RAW_DATA_DIR, "**", "*.csv"), recursive=True)
-    print(f"Found {len(csv_files)} CSV files.")
-
-    if not csv_files:
-        print("No CSV files found!")
-        return
-
-    for fpath in csv_files:
-        try:
-            # Read CSV with CP949 encoding (common for Korean public data)
-            # Lines 1 is header.
-            df = pd.read_csv(fpath, encoding='cp949')
-            
-            # Simple check of columns
-            # Column 0: Station Name (assumed)
-            # Column 2: Date (e.g. 2024-12-01(일))
-            
-            for index, row in df.iterrows():
-                station_raw = str(row.iloc[0]).strip()
-                date_str = str(row.iloc[2]).strip()
-                
-                # Cleanup Station Name (Remove brackets e.g. "구래 [도시철도]")
-                station = station_raw.split('[')[0].strip()
-                if station == "nan": continue
-
-                # Determine Day Type
-                is_weekend = '토' in date_str or '일' in date_str
-                day_type = 'Weekend' if is_weekend else 'Weekday'
+    # Determine Day Type (토/일 -> Weekend), 날짜 차원의 weekend 컬럼을 정수 날짜 인덱스로 조회
+    if dim is None:
+        dim = dim_for_table(table)
+    weekend = dim['weekend'].to_numpy()[date_index(dim, table['date'].to_numpy())]
+    table = table.assign(day_type=np.where(weekend, 'Weekend', 'Weekday'))
+    sums = table.groupby(['station', 'day_type', 'hour'], observed=True, sort=False).agg(
+        b=('board', 'sum'), a=('alight', 'sum'), c=('board', 'size'))
 
-                if station not in agg_data:
-                    agg_data[station] = { 'Weekday': {}, 'Weekend': {} }
-                
-                target_store = agg_data[station][day_type]
-
-                # Iterate Columns for Hours
-                # Structure: 04(B), 04(A), 05(B), 05(A)...
-                # Start index 3.
-                # Headers usually: "04(승차)", "04(하차)"...
-                
-                col_idx = 3
-                num_cols = len(df.columns)
-                
-                # We assume pairs.
-                while col_idx < num_cols - 1:
-                    header = str(df.columns[col_idx])
-                    # Extract Hour
-                    # "04(승차)" -> 4
-                    hour_match = re.search(r'(\d+)', header)
-                    if not hour_match:
-                        col_idx += 2
-                        continue
-                        
-                    hour = int(hour_match.group(1))
-                    
-                    board = row.iloc[col_idx]
-                    alight = row.iloc[col_idx+1]
-                    
-                    # Handle NaNs
-                    try:
-                        board = int(board)
-                    except: board = 0
-                    try:
-                        alight = int(alight)
-                    except: alight = 0
-                    
-                    if hour not in target_store:
-                        target_store[hour] = {'b': 0, 'a': 0, 'c': 0}
-                    
-                    target_store[hour]['b'] += board
-                    target_store[hour]['a'] += alight
-                    target_store[hour]['c'] += 1
-                    
-                    col_idx += 2
-
-        except Exception as e:
-            print(f"Error processing {fpath}: {e}")
+    for (station, day_type, hour), b, a, c in zip(sums.index, sums['b'], sums['a'], sums['c']):
+        if station not in agg_data:
+            agg_data[station] = { 'Weekday': {}, 'Weekend': {} }
+        agg_data[station][day_type][int(hour)] = {'b': int(b), 'a': int(a), 'c': int(c)}
 
     # Generate JSON content
     # Format: "Station": { hour: { board: AVG, alight: AVG } } ... 
@@ -134,19 +73,38 @@ def parse_ridership():
                 'alight': round(v['a'] / count)
             }
 
+    return final_obj
+
+def save_ridership_data(final_obj):
     js_content = "window.RIDERSHIP_DATA = " + json.dumps(final_obj, ensure_ascii=False, indent=4) + ";"
     
     # Save
-    with open(OUTPUT_FILE_WORKSPACE, 'w', encoding='utf-8') as f:
+    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
         f.write(js_content)
-    print(f"Saved to Workspace: {OUTPUT_FILE_WORKSPACE}")
-    
-    try:
-        with open(OUTPUT_FILE_DESKTOP, 'w', encoding='utf-8') as f:
-            f.write(js_content)
-        print(f"Saved to Desktop: {OUTPUT_FILE_DESKTOP}")
-    except Exception as e:
-        print(f"Failed to save to Desktop: {e}")
+    print(f"Saved: {OUTPUT_FILE}")
+
+    # 로컬 작업 폴더 사본 (해당 PC에서만)
+    for label, path in [("Workspace", OUTPUT_FILE_WORKSPACE), ("Desktop", OUTPUT_FILE_DESKTOP)]:
+        if not os.path.isdir(os.path.dirname(path)):
+            continue
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(js_content)
+            print(f"Saved to {label}: {path}")
+        except Exception as e:
+            print(f"Failed to save to {label}: {e}")
+
+def parse_ridership():
+    print("Starting Ridership Analysis...")
+
+    table = load_ridership(RAW_DATA_DIR)
+    print(f"Loaded {len(table)} rows from {table['file'].nunique()} CSV files.")
+
+    if table.empty:
+        print("No CSV files found!")
+        return
+
+    save_ridership_data(build_ridership_data(table))
 
 if __name__ == "__main__":
     parse_ridership()
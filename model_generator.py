@@ -1,11 +1,12 @@
 import os
-import glob
-import pandas as pd
 import json
-import re
 from datetime import datetime
 import urllib.request
 import urllib.error
+import numpy as np
+import pandas as pd
+from ridership_store import iter_ridership
+from date_dim import build_date_dim, dim_for_table, date_index
 
 # ==============================================================================
 # 1. 설정 (Configuration)
@@ -18,24 +19,6 @@ OUTPUT_FILE_DESKTOP = r"C:\Users\박남순\OneDrive\Desktop\gimpo-goldline\asset
 LAT = 37.615
 LON = 126.715
 
-# [필수] 공휴일 데이터
-HOLIDAYS = set([
-    "2024-01-01", "2024-02-09", "2024-02-10", "2024-02-11", "2024-02-12",
-    "2024-03-01", "2024-04-10",
-    "2024-05-05", "2024-05-06", "2024-05-15",
-    "2024-06-06", "2024-08-15", "2024-09-16", "2024-09-17", "2024-09-18",
-    "2024-10-03", "2024-10-09", "2024-12-25",
-    "2025-01-01", "2025-01-27", "2025-01-28", "2025-01-29", "2025-01-30"
-])
-
-def get_holiday_status(date_str):
-    if date_str in HOLIDAYS: return 'Holiday'
-    try:
-        dt = datetime.strptime(date_str, "%Y-%m-%d")
-        if dt.weekday() >= 5: return 'Holiday'
-    except: pass
-    return 'Workday'
-
 # WMO 코드 변환 (단순화)
 def convert_wmo(code):
     if code is None: return "Clear"
@@ -91,155 +74,218 @@ def fetch_7day_forecast():
 # ==============================================================================
 # 3. 메인 로직
 # ==============================================================================
-def run_extraction():
-    print("🚀 Model Generator 시작 (Hybrid: Past + Future)")
-    
-    csv_files = glob.glob(os.path.join(RAW_DATA_DIR, "**", "*.csv"), recursive=True)
-    if not csv_files:
-        print("❌ CSV 파일 없음.")
-        return
-
-    # 1. 날짜 범위 파악
-    all_dates = []
-    for fpath in csv_files:
-        try:
-            df = pd.read_csv(fpath, encoding='cp949', usecols=[2])
-            dates = [d.split('(')[0].strip() for d in df.iloc[:, 0].astype(str).tolist() if '-' in str(d)]
-            all_dates.extend(dates)
-        except: continue
-        
-    if not all_dates: return
-    all_dates.sort()
-    start_date, end_date = all_dates[0], all_dates[-1]
-
-    # 2. 날씨 데이터 수집
+def fetch_weather(table):
+    """테이블 날짜 범위의 과거 날씨 + 7일 예보. 과거 날씨를 못 받으면 (None, 예보)"""
+    start_date = table['date'].min().strftime("%Y-%m-%d")
+    end_date = table['date'].max().strftime("%Y-%m-%d")
     history_weather = fetch_historical_weather(start_date, end_date)
     future_forecast = fetch_7day_forecast() # [추가된 기능]
+    return history_weather, future_forecast
 
-    if history_weather is None: return 
+# ==============================================================================
+# 3. 집계 (누적기)
+# ------------------------------------------------------------------------------
+# 관측값을 리스트에 모아 두지 않고 (개수, 합계)만 미리 잡은 NumPy 배열에 더합니다.
+#   - BASE_LOAD: [역, 일자유형(Workday/Holiday), 시간] 승차/하차
+#   - SEASON_FACTORS: [월] 승차
+#   - WEATHER_FACTORS: [시간대(Peak/Off), 일자] 승차 -> finish()에서 일자별 날씨로 묶음
+# 날씨는 일자 단위로 쌓아 두었다가 마지막에 붙이므로, 파티션을 차례로 넣으면서
+# (iter_ridership) 날짜 범위를 먼저 알아낸 뒤 과거 날씨를 받아도 됩니다.
+# 메모리는 관측 수가 아니라 키 수(역 x 2 x 24 + 12 + 2 x 일수)에 비례합니다.
+# 평균만 쓰므로 분산(Welford)은 쌓지 않습니다.
+# ==============================================================================
+DAY_TYPES = ['Workday', 'Holiday']
+PERIODS = ['Peak', 'Off']
+HOURS = 24
 
-    # 3. 데이터 분석 (기존 로직 유지)
-    base_data = {} 
-    monthly_totals = {}
-    weather_totals = { "Peak": {}, "Off": {} } # [NEW] 시간대별 분리 
-    
-    for fpath in csv_files:
-        try:
-            df = pd.read_csv(fpath, encoding='cp949')
-            for index, row in df.iterrows():
-                try:
-                    station = str(row.iloc[0]).split('[')[0].strip()
-                    if station == "nan": continue
-                    date_only = str(row.iloc[2]).split('(')[0].strip()
-                    dt = datetime.strptime(date_only, "%Y-%m-%d")
-                    day_type = get_holiday_status(date_only)
-                    weather = history_weather.get(date_only, "Clear")
-                    
-                    if station not in base_data: base_data[station] = { 'Workday': {}, 'Holiday': {} }
+class ConstantAccumulator:
+    def __init__(self, dim=None):
+        # dim: date_dim 날짜 차원 (있으면 공휴일/월/날씨를 여기서, 없으면 파티션 날짜로 공휴일/월만 만듦)
+        self.dim = dim
+        self.stations = []
+        self.base_n = np.zeros((0, len(DAY_TYPES), HOURS))
+        self.base_b = np.zeros_like(self.base_n)
+        self.base_a = np.zeros_like(self.base_n)
+        self.month_n = np.zeros(12)
+        self.month_b = np.zeros(12)
+        self.day0 = None                      # 일자 축 시작 (datetime64[D])
+        self.day_n = np.zeros((len(PERIODS), 0))
+        self.day_b = np.zeros((len(PERIODS), 0))
+
+    def _station_codes(self, station):
+        """행별 역 번호 (self.stations 순서, 새 역은 처음 나온 순서대로 추가)"""
+        cat = station if isinstance(station.dtype, pd.CategoricalDtype) else station.astype('category')
+        codes = cat.cat.codes.to_numpy()
+        names = cat.cat.categories.astype(str)
+        present, first = np.unique(codes, return_index=True)
+        lut = np.full(len(names), -1, dtype=np.int64)
+        for c in present[np.argsort(first)]:
+            if names[c] not in self.stations:
+                self.stations.append(names[c])
+            lut[c] = self.stations.index(names[c])
+        grow = len(self.stations) - self.base_n.shape[0]
+        if grow > 0:
+            pad = ((0, grow), (0, 0), (0, 0))
+            self.base_n, self.base_b, self.base_a = (np.pad(x, pad) for x in (self.base_n, self.base_b, self.base_a))
+        return lut[codes]
+
+    def _day_offsets(self, days):
+        lo, hi = days.min(), days.max()
+        if self.day0 is None:
+            self.day0 = lo
+        before = max(0, int((self.day0 - lo).astype(np.int64)))
+        # 기존 day0 / 길이 기준 (앞쪽으로 늘어난 만큼은 before가 따로 채움)
+        after = max(0, int((hi - self.day0).astype(np.int64)) + 1 - self.day_n.shape[1])
+        if before or after:
+            self.day_n, self.day_b = (np.pad(x, ((0, 0), (before, after))) for x in (self.day_n, self.day_b))
+            self.day0 = self.day0 - before
+        return (days - self.day0).astype(np.int64)
+
+    def add(self, chunk):
+        """load_ridership() / iter_ridership() 행을 누적"""
+        if chunk.empty:
+            return
+        # 역 순서는 처음 나온 순서 (기존 dict 순서와 같게)
+        st = self._station_codes(chunk['station'])
+
+        days = chunk['date'].to_numpy().astype('datetime64[D]')
+        if self.dim is not None:
+            di = date_index(self.dim, days)
+            day_off = self.dim['day_off'].to_numpy()[di]
+            month = self.dim['month'].to_numpy()[di]
+        else:
+            uniq, inv = np.unique(days, return_inverse=True)
+            local = build_date_dim(uniq, weather={})
+            day_off = local['day_off'].to_numpy()[inv]
+            month = local['month'].to_numpy()[inv]
+
+        hour = chunk['hour'].to_numpy().astype(np.int64)
+        board = chunk['board'].to_numpy().astype(np.float64)
+        alight = chunk['alight'].to_numpy().astype(np.float64)
+
+        size = self.base_n.size
+        flat = (st * len(DAY_TYPES) + day_off.astype(np.int64)) * HOURS + hour
+        self.base_n += np.bincount(flat, minlength=size).reshape(self.base_n.shape)
+        self.base_b += np.bincount(flat, weights=board, minlength=size).reshape(self.base_n.shape)
+        self.base_a += np.bincount(flat, weights=alight, minlength=size).reshape(self.base_n.shape)
+
+        self.month_n += np.bincount(month - 1, minlength=12)
+        self.month_b += np.bincount(month - 1, weights=board, minlength=12)
+
+        # [NEW] 시간대별 날씨 영향 분리 (Peak vs Off)
+        # 출근(06:30~08:30) -> 6,7,8시 / 퇴근(17:30~19:30) -> 17,18,19시
+        is_peak = ((6 <= hour) & (hour <= 8)) | ((17 <= hour) & (hour <= 19))
+        offset = self._day_offsets(days)
+        span = self.day_n.shape[1]
+        flat = np.where(is_peak, 0, 1) * span + offset
+        self.day_n += np.bincount(flat, minlength=2 * span).reshape(2, span)
+        self.day_b += np.bincount(flat, weights=board, minlength=2 * span).reshape(2, span)
+
+    def date_range(self):
+        """누적한 일자 범위 ('YYYY-MM-DD', 'YYYY-MM-DD'), 비어 있으면 None"""
+        if self.day0 is None:
+            return None
+        return str(self.day0), str(self.day0 + self.day_n.shape[1] - 1)
+
+    def _day_weather(self, history_weather):
+        days = self.day0 + np.arange(self.day_n.shape[1])
+        if self.dim is not None:
+            return self.dim['weather'].to_numpy()[date_index(self.dim, days)]
+        return np.array([history_weather.get(str(d), "Clear") for d in days])
+
+    def finish(self, history_weather, future_forecast):
+        """누적 결과 -> MODEL_CONSTANTS 객체"""
+        # 계수 산출 (관측이 있는 (역, 일자유형, 시간)만)
+        base_load_final = {}
+        avg_b = np.divide(self.base_b, self.base_n, out=np.zeros_like(self.base_b), where=self.base_n > 0)
+        avg_a = np.divide(self.base_a, self.base_n, out=np.zeros_like(self.base_a), where=self.base_n > 0)
+        for s_i, st in enumerate(self.stations):
+            base_load_final[st] = {}
+            for t_i, dtype in enumerate(DAY_TYPES):
+                hours = np.flatnonzero(self.base_n[s_i, t_i] > 0)
+                base_load_final[st][dtype] = {
+                    int(h): {'b': round(float(avg_b[s_i, t_i, h])), 'a': round(float(avg_a[s_i, t_i, h]))}
+                    for h in hours}
+
+        # [Bathtub Theory] Gimpo Airport Boarding = Sum(Others Alighting)
+        # Reason: Gimpo Airport boarding data is missing transfer passengers. 
+        # Logic: In a closed system, total alighting at other stations must have originated from Gimpo (for the return leg).
+        for dtype in DAY_TYPES:
+            # Assuming hours 5 to 0 (24h coverage)
+            all_hours = set()
+            for h_map in base_load_final.values():
+                 if dtype in h_map: all_hours.update(h_map[dtype].keys())
+            
+            for h in all_hours:
+                total_alight_others = 0
+                for st in base_load_final:
+                    if st == '김포공항': continue
+                    if dtype in base_load_final[st] and h in base_load_final[st][dtype]:
+                        total_alight_others += base_load_final[st][dtype][h]['a']
+                
+                # Apply to Gimpo Airport
+                if '김포공항' in base_load_final and dtype in base_load_final['김포공항']:
+                    # Ensure hour key exists
+                    if h not in base_load_final['김포공항'][dtype]:
+                        base_load_final['김포공항'][dtype][h] = {'b': 0, 'a': 0}
                     
-                    col_idx = 3
-                    while col_idx < len(df.columns) - 1:
-                        if not re.search(r'(\d+)', str(df.columns[col_idx])): 
-                            col_idx += 2; continue
-                        hour = int(re.search(r'(\d+)', str(df.columns[col_idx])).group(1))
-                        try: board = int(row.iloc[col_idx]); alight = int(row.iloc[col_idx+1])
-                        except: board=0; alight=0
-                        
-                        # [Correction] Removed hardcoded 5.0x multiplier. Now using Bathtub Theory post-processing.
-                        if False: # Legacy Code
-                            if station == '김포공항':
-                                board = int(board * 5.0)
-                                alight = int(alight * 5.0)
-                        
-                        if hour not in base_data[station][day_type]:
-                            base_data[station][day_type][hour] = {'b': [], 'a': []}
-                        base_data[station][day_type][hour]['b'].append(board)
-                        base_data[station][day_type][hour]['a'].append(alight)
-                        
-                        if dt.month not in monthly_totals: monthly_totals[dt.month] = []
-                        monthly_totals[dt.month].append(board)
-                        
-                        # [NEW] 시간대별 날씨 영향 분리 (Peak vs Off)
-                        # 출근(06:30~08:30) -> 6,7,8시 / 퇴근(17:30~19:30) -> 17,18,19시
-                        is_peak = (6 <= hour <= 8) or (17 <= hour <= 19)
-                        period = "Peak" if is_peak else "Off"
-                        
-                        if weather not in weather_totals[period]: weather_totals[period][weather] = []
-                        weather_totals[period][weather].append(board)
-                        
-                        col_idx += 2
-                except: continue
-        except: continue
-
-    # 계수 산출
-    base_load_final = {}
-    for st, days in base_data.items():
-        base_load_final[st] = {}
-        for dtype, hours in days.items():
-            base_load_final[st][dtype] = {}
-            for h, vals in hours.items():
-                avg_b = sum(vals['b'])/len(vals['b']) if vals['b'] else 0
-                avg_a = sum(vals['a'])/len(vals['a']) if vals['a'] else 0
-                base_load_final[st][dtype][h] = {'b': round(avg_b), 'a': round(avg_a)}
-
-    # [Bathtub Theory] Gimpo Airport Boarding = Sum(Others Alighting)
-    # Reason: Gimpo Airport boarding data is missing transfer passengers. 
-    # Logic: In a closed system, total alighting at other stations must have originated from Gimpo (for the return leg).
-    for dtype in ['Workday', 'Holiday']:
-        # Assuming hours 5 to 0 (24h coverage)
-        all_hours = set()
-        for h_map in base_load_final.values():
-             if dtype in h_map: all_hours.update(h_map[dtype].keys())
+                    # Overwrite Boarding
+                    base_load_final['김포공항'][dtype][h]['b'] = total_alight_others
+
+        observed = np.flatnonzero(self.month_n > 0)
+        yearly_avg = self.month_b.sum() / self.month_n.sum() if len(observed) else 1
+        seasonal_factors = {int(m) + 1: round(float(self.month_b[m] / self.month_n[m] / yearly_avg), 2) for m in observed}
+        for m in range(1,13): 
+            if m not in seasonal_factors: seasonal_factors[m] = 1.0
+
+        # [NEW] 시간대별 날씨 계수 산출: 일자별 합계를 그날 날씨로 묶음
+        weather_n, weather_b = {p: {} for p in PERIODS}, {p: {} for p in PERIODS}
+        if self.day0 is not None:
+            day_weather = self._day_weather(history_weather)
+            names, code = np.unique(day_weather, return_inverse=True)
+            for p_i, p in enumerate(PERIODS):
+                n = np.bincount(code, weights=self.day_n[p_i], minlength=len(names))
+                b = np.bincount(code, weights=self.day_b[p_i], minlength=len(names))
+                for w, wn, wb in zip(names.tolist(), n, b):
+                    if wn > 0:
+                        weather_n[p][w], weather_b[p][w] = wn, wb
+
+        weather_factors = {}
+        all_weather_types = set(list(weather_n["Peak"].keys()) + list(weather_n["Off"].keys()))
         
-        for h in all_hours:
-            total_alight_others = 0
-            for st in base_load_final:
-                if st == '김포공항': continue
-                if dtype in base_load_final[st] and h in base_load_final[st][dtype]:
-                    total_alight_others += base_load_final[st][dtype][h]['a']
-            
-            # Apply to Gimpo Airport
-            if '김포공항' in base_load_final and dtype in base_load_final['김포공항']:
-                # Ensure hour key exists
-                if h not in base_load_final['김포공항'][dtype]:
-                    base_load_final['김포공항'][dtype][h] = {'b': 0, 'a': 0}
+        for w in all_weather_types:
+            weather_factors[w] = {}
+            for p in PERIODS:
+                # 해당 시간대(p)의 'Clear' 평균 구하기 (기준점)
+                base_avg = weather_b[p]["Clear"] / weather_n[p]["Clear"] if "Clear" in weather_n[p] else 1.0
                 
-                # Overwrite Boarding
-                base_load_final['김포공항'][dtype][h]['b'] = total_alight_others
+                # 해당 날씨(w)의 평균 구하기
+                target_avg = weather_b[p][w] / weather_n[p][w] if w in weather_n[p] else base_avg
+                
+                # 계수 = (특정날씨 평균 / 맑은날 평균)
+                factor = round(float(target_avg / base_avg), 2)
+                weather_factors[w][p] = factor
 
-    yearly_avg = sum(sum(vs) for vs in monthly_totals.values()) / sum(len(vs) for vs in monthly_totals.values()) if monthly_totals else 1
-    seasonal_factors = {m: round((sum(monthly_totals[m])/len(monthly_totals[m])) / yearly_avg, 2) for m in monthly_totals} if monthly_totals else {}
-    for m in range(1,13): 
-        if m not in seasonal_factors: seasonal_factors[m] = 1.0
+        return {
+            "BASE_LOAD": base_load_final,
+            "SEASON_FACTORS": seasonal_factors,
+            "WEATHER_FACTORS": weather_factors,
+            "FORECAST": future_forecast,  # [핵심] 여기에 미래 7일 날씨가 저장됩니다
+            "META": { "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S") }
+        }
 
-    # [NEW] 시간대별 날씨 계수 산출
-    weather_factors = {}
-    all_weather_types = set(list(weather_totals["Peak"].keys()) + list(weather_totals["Off"].keys()))
-    
-    for w in all_weather_types:
-        weather_factors[w] = {}
-        for p in ["Peak", "Off"]:
-            # 해당 시간대(p)의 'Clear' 평균 구하기 (기준점)
-            base_list = weather_totals[p].get("Clear", [])
-            base_avg = sum(base_list)/len(base_list) if base_list else 1.0
-            
-            # 해당 날씨(w)의 평균 구하기
-            target_list = weather_totals[p].get(w, [])
-            target_avg = sum(target_list)/len(target_list) if target_list else base_avg
-            
-            # 계수 = (특정날씨 평균 / 맑은날 평균)
-            factor = round(target_avg / base_avg, 2)
-            weather_factors[w][p] = factor
+def build_model_constants(table, history_weather, future_forecast, dim=None):
+    """
+    load_ridership() 테이블 -> MODEL_CONSTANTS 객체
+    dim: date_dim 날짜 차원 테이블 (None이면 history_weather로 새로 만듦)
+    """
+    if dim is None:
+        dim = dim_for_table(table, weather=history_weather)
+    acc = ConstantAccumulator(dim)
+    acc.add(table)
+    return acc.finish(history_weather, future_forecast)
 
-    # 4. 저장 (FORECAST 포함)
-    output_obj = {
-        "BASE_LOAD": base_load_final,
-        "SEASON_FACTORS": seasonal_factors,
-        "WEATHER_FACTORS": weather_factors,
-        "FORECAST": future_forecast,  # [핵심] 여기에 미래 7일 날씨가 저장됩니다
-        "META": { "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S") }
-    }
-    
+def save_model_constants(output_obj):
     js_content = "const MODEL_CONSTANTS = " + json.dumps(output_obj, ensure_ascii=False, indent=4) + ";"
     
     try:
@@ -252,5 +298,51 @@ def run_extraction():
             with open(OUTPUT_FILE_DESKTOP, 'w', encoding='utf-8') as f: f.write(js_content)
     except: pass
 
+def run_extraction():
+    print("🚀 Model Generator 시작 (Hybrid: Past + Future)")
+    
+    # 1. 파티션 단위로 읽으면서 누적 (전체 테이블을 메모리에 올리지 않음)
+    acc = ConstantAccumulator()
+    for chunk in iter_ridership(RAW_DATA_DIR):
+        acc.add(chunk)
+    if acc.date_range() is None:
+        print("❌ CSV 파일 없음.")
+        return
+
+    # 2. 날짜 범위 + 날씨 데이터 수집
+    start_date, end_date = acc.date_range()
+    history_weather = fetch_historical_weather(start_date, end_date)
+    future_forecast = fetch_7day_forecast() # [추가된 기능]
+    if history_weather is None: return 
+
+    # 4. 저장 (FORECAST 포함)
+    save_model_constants(acc.finish(history_weather, future_forecast))
+
+def check_streaming(raw_dir=RAW_DATA_DIR, partition_rows=5000, seed=0):
+    """
+    작은 파티션을 섞은 순서로 누적한 결과가 전체 테이블 한 번과 같은지 확인합니다.
+    (파티션은 파일 이름 순서라 날짜 순서가 아님: 일자 축이 앞/뒤로 같이 늘어나는 경우 포함)
+    """
+    import tempfile
+    from ridership_store import load_ridership
+    with tempfile.TemporaryDirectory() as cache_dir:
+        parts = list(iter_ridership(raw_dir, cache_dir, partition_rows=partition_rows))
+    if not parts:
+        print("❌ CSV 파일 없음.")
+        return False
+    acc = ConstantAccumulator()
+    for i in np.random.default_rng(seed).permutation(len(parts)):
+        acc.add(parts[i])
+    one = ConstantAccumulator()
+    one.add(load_ridership(raw_dir))
+
+    strip = lambda obj: json.dumps({k: v for k, v in obj.items() if k != "META"}, sort_keys=True, ensure_ascii=False)
+    same = acc.date_range() == one.date_range() and strip(acc.finish({}, [])) == strip(one.finish({}, []))
+    print(f"{'✅' if same else '❌'} 파티션 {len(parts)}개 (섞은 순서) vs 전체 테이블: {'같음' if same else '다름'}")
+    return same
+
 if __name__ == "__main__":
+    import sys
+    if "--check-stream" in sys.argv:
+        sys.exit(0 if check_streaming() else 1)
     run_extraction()
\ No newline at end of file
@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import hashlib
+import numpy as np
+import pandas as pd
+import joblib
+import sklearn
+
+# ==============================================================================
+# 학습된 모델 저장소 (.cache/models)
+# ------------------------------------------------------------------------------
+# 학습 데이터 + 하이퍼파라미터의 해시(fingerprint)를 키로 모델을 저장해두고,
+# 입력이 그대로면 다시 학습하지 않고 불러옵니다 (같은 raw_data로 도는 cron 대비).
+#   - 배열 dict (data_collector 선형 계수): <kind>/<key>.npz + <key>.json (pickle 없음)
+#   - 그 밖의 객체 (scripts/data_collector RandomForest 파이프라인): <kind>/<key>.joblib
+# sklearn 버전도 키에 들어가므로 버전이 바뀌면 자동으로 다시 학습합니다.
+# 종류(kind)별로 최근 MAX_ENTRIES개만 남깁니다.
+# ==============================================================================
+REGISTRY_DIR = os.path.join(os.getcwd(), ".cache", "models")
+REGISTRY_VERSION = 1
+MAX_ENTRIES = 2
+
+
+def _update_hash(h, part):
+    if isinstance(part, pd.DataFrame):
+        h.update(json.dumps([list(map(str, part.columns)), list(map(str, part.dtypes))]).encode())
+        h.update(pd.util.hash_pandas_object(part, index=False).to_numpy().tobytes())
+    elif isinstance(part, pd.Series):
+        _update_hash(h, part.to_frame())
+    elif isinstance(part, np.ndarray):
+        arr = np.ascontiguousarray(part)
+        h.update(f"{arr.dtype.str}{arr.shape}".encode())
+        h.update(arr.tobytes() if arr.dtype != object else json.dumps(arr.tolist(), default=str).encode())
+    else:
+        h.update(json.dumps(part, sort_keys=True, ensure_ascii=False, default=str).encode())
+
+
+def fingerprint(*parts):
+    """학습 데이터(DataFrame / 배열)와 하이퍼파라미터(dict 등) -> 해시 키"""
+    h = hashlib.sha256(f"v{REGISTRY_VERSION}|sklearn{sklearn.__version__}".encode())
+    for part in parts:
+        h.update(b"|")
+        _update_hash(h, part)
+    return h.hexdigest()[:24]
+
+
+def _entry_paths(kind, key, registry_dir):
+    base = os.path.join(registry_dir, kind, key)
+    return base + ".npz", base + ".json", base + ".joblib"
+
+
+def load_model(kind, key, registry_dir=REGISTRY_DIR):
+    """저장된 모델 (없거나 읽을 수 없으면 None)"""
+    npz_path, json_path, joblib_path = _entry_paths(kind, key, registry_dir)
+    try:
+        if os.path.exists(joblib_path):
+            obj = joblib.load(joblib_path)
+        elif os.path.exists(npz_path) and os.path.exists(json_path):
+            with open(json_path, 'r', encoding='utf-8') as f:
+                obj = json.load(f)
+            with np.load(npz_path, allow_pickle=False) as z:
+                obj.update({k: z[k] for k in z.files})
+        else:
+            return None
+    except Exception as e:  # 깨진 캐시는 다시 학습
+        print(f"⚠️ model registry: {kind}/{key} 읽기 실패 ({e}), 다시 학습합니다.")
+        return None
+    os.utime(npz_path if os.path.exists(npz_path) else joblib_path)
+    return obj
+
+
+def save_model(kind, key, obj, registry_dir=REGISTRY_DIR):
+    """모델 저장 (배열 dict는 npz + json, 그 밖에는 joblib). 오래된 항목은 정리."""
+    npz_path, json_path, joblib_path = _entry_paths(kind, key, registry_dir)
+    os.makedirs(os.path.dirname(npz_path), exist_ok=True)
+    if isinstance(obj, dict) and any(isinstance(v, np.ndarray) for v in obj.values()):
+        arrays = {k: v for k, v in obj.items() if isinstance(v, np.ndarray)}
+        meta = {k: v for k, v in obj.items() if not isinstance(v, np.ndarray)}
+        tmp = npz_path[:-4] + ".tmp.npz"
+        np.savez(tmp, **arrays)
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, npz_path)
+    else:
+        joblib.dump(obj, joblib_path + ".tmp")  # 압축하지 않음 (불러오기 속도 우선)
+        os.replace(joblib_path + ".tmp", joblib_path)
+    _prune(os.path.dirname(npz_path))
+
+
+def _prune(kind_dir, keep=MAX_ENTRIES):
+    entries = {}
+    for name in os.listdir(kind_dir):
+        key, ext = os.path.splitext(name)
+        if ext in (".npz", ".joblib") and not key.endswith(".tmp"):
+            entries[key] = os.path.getmtime(os.path.join(kind_dir, name))
+    for key in sorted(entries, key=entries.get, reverse=True)[keep:]:
+        for ext in (".npz", ".json", ".joblib"):
+            path = os.path.join(kind_dir, key + ext)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def cached_model(kind, key, train_fn, registry_dir=REGISTRY_DIR):
+    """key로 저장된 모델이 있으면 불러오고, 없으면 train_fn()으로 학습해서 저장"""
+    t0 = time.time()
+    obj = load_model(kind, key, registry_dir)
+    if obj is not None:
+        print(f"♻️ {kind} 모델 캐시 사용 ({key}, {(time.time() - t0) * 1000:.0f} ms)")
+        return obj
+    obj = train_fn()
+    save_model(kind, key, obj, registry_dir)
+    return obj
@@ -0,0 +1,152 @@
+import time
+import argparse
+import numpy as np
+
+# ==============================================================================
+# 역간 OD(출발 -> 도착) 행렬 추정: 중력 모형 초기값 + IPF (반복 비례 조정)
+# ------------------------------------------------------------------------------
+# 역별 승차 / 하차 인원만 있으므로, (일자, 시간)마다 10 x 10 행렬을
+#   행 합 = 출발역 승차, 열 합 = 도착역 하차 가 되도록 초기값을 행/열 비율로 번갈아 맞춥니다.
+#   - 초기값: exp(-GRAVITY_BETA * 역 간격) (같은 역 -> 같은 역은 0)
+#   - 한 시간 안의 승차 합과 하차 합은 다르므로 (시간 경계를 넘는 통행) 두 합의 평균으로 맞춘 뒤 추정
+#   - 모든 (일자, 시간)을 [N, 10, 10] 배치로 한꺼번에 갱신하고, 수렴 확인도 배치별로 한 번에 해서
+#     아직 수렴하지 않은 행렬만 계속 갱신합니다.
+# 입력: data_collector.build_board_alight()의 승차 / 하차 [D, 20, 10] (역 축 = STATION_MAP 순서)
+# 출력: OD [D, 20, 10, 10] (od[d, h, i, j] = i역 승차 -> j역 하차)
+# ==============================================================================
+GRAVITY_BETA = 0.2   # 역 하나 멀어질 때마다 초기값이 줄어드는 정도
+IPF_TOL = 1e-6       # 행 합 오차 / 해당 시간 총 통행 수가 이 아래면 수렴
+IPF_MAX_ITER = 500
+
+
+def gravity_seed(n_stations, beta=GRAVITY_BETA):
+    """초기 행렬 [n, n]: exp(-beta * |i - j|), 대각선 0"""
+    hops = np.abs(np.subtract.outer(np.arange(n_stations), np.arange(n_stations)))
+    return np.where(hops > 0, np.exp(-beta * hops), 0.0)
+
+
+def balanced_margins(board, alight):
+    """
+    승차 / 하차 [..., n] -> 합이 같아지도록 맞춘 (행 목표, 열 목표) (둘 다 float64)
+    총량은 승차 합과 하차 합의 평균, 한쪽이 0이면 다른 쪽 합 (그래도 0이면 0)
+    """
+    board = np.asarray(board, dtype=np.float64)
+    alight = np.asarray(alight, dtype=np.float64)
+    b_sum = board.sum(axis=-1, keepdims=True)
+    a_sum = alight.sum(axis=-1, keepdims=True)
+    total = np.where((b_sum > 0) & (a_sum > 0), (b_sum + a_sum) / 2, 0.0)
+    row = np.divide(board * total, b_sum, out=np.zeros_like(board), where=b_sum > 0)
+    col = np.divide(alight * total, a_sum, out=np.zeros_like(alight), where=a_sum > 0)
+    return row, col
+
+
+def _scale(target, current):
+    return np.divide(target, current, out=np.zeros_like(current), where=current > 0)
+
+
+def ipf(seed, row, col, tol=IPF_TOL, max_iter=IPF_MAX_ITER):
+    """
+    배치 IPF: seed [N, n, n] (또는 [n, n]), row / col [N, n] (배치마다 합이 같아야 함)
+    반환: (M [N, n, n], 반복 횟수 [N], 행 합 상대 오차 [N])
+    열 맞춤 뒤 행 합 오차로 수렴을 판단하므로 열 합은 항상 정확합니다 (가능한 경우).
+    목표를 맞출 수 없는 배치 (예: 승차와 하차가 같은 역 하나뿐)는 max_iter까지 돌고 오차가 남습니다.
+    """
+    row = np.asarray(row, dtype=np.float64)
+    col = np.asarray(col, dtype=np.float64)
+    n_batch = row.shape[0]
+    M = np.broadcast_to(seed, (n_batch,) + row.shape[1:] * 2).astype(np.float64)
+    M = M * ((row > 0)[:, :, None] & (col > 0)[:, None, :])
+    total = np.maximum(row.sum(axis=1), 1e-12)
+
+    iters = np.zeros(n_batch, dtype=np.int64)
+    err = np.zeros(n_batch)
+    active = np.flatnonzero(total > 1e-12)
+    for it in range(1, max_iter + 1):
+        if not active.size:
+            break
+        m = M[active]
+        m *= _scale(row[active], m.sum(axis=2))[:, :, None]
+        m *= _scale(col[active], m.sum(axis=1))[:, None, :]
+        M[active] = m
+        e = np.abs(m.sum(axis=2) - row[active]).max(axis=1) / total[active]
+        iters[active] = it
+        err[active] = e
+        active = active[e > tol]
+    return M, iters, err
+
+
+def estimate_od(board, alight, beta=GRAVITY_BETA, tol=IPF_TOL, max_iter=IPF_MAX_ITER):
+    """
+    승차 / 하차 [D, H, S] -> (OD [D, H, S, S], {"iterations" [D, H], "residual" [D, H], "converged" [D, H]})
+    """
+    board = np.asarray(board)
+    lead, n_st = board.shape[:-1], board.shape[-1]
+    row, col = balanced_margins(board.reshape(-1, n_st), np.asarray(alight).reshape(-1, n_st))
+    M, iters, err = ipf(gravity_seed(n_st, beta), row, col, tol, max_iter)
+    info = {"iterations": iters.reshape(lead), "residual": err.reshape(lead), "converged": (err <= tol).reshape(lead)}
+    return M.reshape(lead + (n_st, n_st)), info
+
+
+def od_line_load(od):
+    """
+    OD [..., S, S] -> 방향별 역 출발 후 재차 인원 [2, ..., S] (data_collector.line_load와 같은 축)
+    0: 김포공항방면 (i < j 통행), 1: 양촌역방면 (i > j 통행)
+    """
+    up = np.triu(np.ones(od.shape[-2:], dtype=bool), 1)
+    down = up.T
+    to_airport = np.where(up, od, 0)
+    to_yangchon = np.where(down, od, 0)
+    load0 = np.cumsum(to_airport.sum(axis=-1) - to_airport.sum(axis=-2), axis=-1)
+    load1 = np.cumsum((to_yangchon.sum(axis=-1) - to_yangchon.sum(axis=-2))[..., ::-1], axis=-1)[..., ::-1]
+    return np.stack([load0, load1])
+
+
+def segment_flow_residual(od, board, alight):
+    """
+    OD에서 나온 재차 인원 검산: 구간 (k, k+1)의 순 통과량 (김포공항방면 - 양촌역방면)은
+    맞춘 승차 - 하차의 누적합 (data_collector.line_load의 0 자르기 전 값)과 같아야 합니다.
+    반환: (일자, 시간)별 최대 차이 / 해당 시간 총 통행 수 [..] (수렴한 행렬은 IPF_TOL 정도)
+    """
+    load = od_line_load(od)
+    net = load[0][..., :-1] - load[1][..., 1:]
+    row, col = balanced_margins(board, alight)
+    expected = np.cumsum(row - col, axis=-1)[..., :-1]
+    return np.abs(net - expected).max(axis=-1) / np.maximum(row.sum(axis=-1), 1e-12)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="(일자, 시간)별 역간 OD 행렬 일괄 추정 (중력 모형 + IPF)")
+    parser.add_argument("--beta", type=float, default=GRAVITY_BETA, help="중력 모형 거리 감쇠 (역 간격당)")
+    parser.add_argument("--hour", type=int, default=8, help="요약을 출력할 시간")
+    args = parser.parse_args()
+
+    import data_collector
+    from build_all import load_line_table
+    dates, board, alight = data_collector.build_board_alight(load_line_table())
+    t0 = time.perf_counter()
+    od, info = estimate_od(board, alight, args.beta)
+    elapsed = time.perf_counter() - t0
+    n = info['converged'].size
+    print(f"{n}개 (일자, 시간) OD 행렬 {od.shape}: {elapsed:.2f}s, "
+          f"수렴 {int(info['converged'].sum())}/{n}, 평균 반복 {info['iterations'].mean():.1f}회")
+
+    stations = list(data_collector.STATION_MAP.values())
+    h = data_collector.SERVICE_HOURS.index(args.hour)
+    mean_od = od[:, h].mean(axis=0)
+    print(f"{args.hour:02d}시 일평균 주요 OD:")
+    for k in np.argsort(mean_od, axis=None)[::-1][:5]:
+        i, j = np.unravel_index(k, mean_od.shape)
+        print(f"  {stations[i]} -> {stations[j]}: {mean_od[i, j]:.0f}명")
+    airport = stations.index("김포공항")
+    share = mean_od[:, airport].sum() / max(mean_od.sum(), 1e-12)
+    print(f"  김포공항 도착 (환승) 비율: {share * 100:.1f}%")
+
+    # 재차 인원 검산: OD 구간 순 통과량 = 누적(승차 - 하차), 그리고 방향을 나누지 않는 line_load와 비교
+    residual = segment_flow_residual(od, board, alight)
+    print(f"구간 순 통과량 검산: 수렴한 행렬 최대 오차 {residual[info['converged']].max():.1e} "
+          f"(허용 {IPF_TOL:.0e}), 수렴 못한 행렬 {int((~info['converged']).sum())}개")
+    od_load = np.maximum(od_line_load(od)[:, :, h].mean(axis=1), 0)     # [2, S]
+    dc_load = data_collector.line_load(board, alight)[:, :, h].mean(axis=1)
+    for k, direction in enumerate(data_collector.DIRECTIONS):
+        print(f"  {args.hour:02d}시 {direction} 평균 재차 (OD / line_load): "
+              + ", ".join(f"{s} {o:.0f}/{l:.0f}" for s, o, l in zip(stations, od_load[k], dc_load[k])))
@@ -0,0 +1,71 @@
+import numpy as np
+
+# ==============================================================================
+# 병합 가능한 분위수 스케치 (DDSketch 방식, 로그 간격 버킷)
+# ------------------------------------------------------------------------------
+# 값 x > 0 을 ceil(log_gamma(x)) 버킷에 세고 (gamma = (1 + a) / (1 - a)), 0 이하는 0번 버킷.
+# 버킷 대표값으로 돌려주는 분위수의 상대 오차는 SKETCH_ALPHA 이하입니다.
+# 스케치는 키마다 고정 길이 개수 배열 [..., N_BUCKETS]이라
+#   - 여러 키를 한 배열에 두고 np.bincount 한 번으로 채우고
+#   - 일자별 / 파티션별 부분 스케치를 더하기만 하면 병합됩니다 (원본 재스캔 불필요).
+# t-digest / KLL 대신 이 방식을 쓴 이유: 배열 덧셈으로 병합되고, 키 수가 많아도 NumPy로 한 번에 처리됨.
+# ==============================================================================
+SKETCH_ALPHA = 0.01
+SKETCH_MAX = 1e6  # 이보다 큰 값은 마지막 버킷으로
+GAMMA = (1 + SKETCH_ALPHA) / (1 - SKETCH_ALPHA)
+# 0번: 0 이하, 1번: (0, 1], k번: (gamma^(k-2), gamma^(k-1)]
+N_BUCKETS = int(np.ceil(np.log(SKETCH_MAX) / np.log(GAMMA))) + 2
+
+
+def bucket_index(values):
+    """값 -> 버킷 번호 (int64)"""
+    x = np.asarray(values, dtype=np.float64)
+    idx = np.ones(x.shape, dtype=np.int64)
+    big = x > 1
+    idx[big] = np.ceil(np.log(x[big]) / np.log(GAMMA)).astype(np.int64) + 1
+    idx[x <= 0] = 0
+    return np.minimum(idx, N_BUCKETS - 1)
+
+
+def bucket_value(idx):
+    """버킷 번호 -> 대표값 (구간 (g^(k-2), g^(k-1)]의 상대 오차 최소 지점)"""
+    idx = np.asarray(idx, dtype=np.int64)
+    upper = GAMMA ** (idx - 1.0)
+    value = 2 * upper / (GAMMA + 1)
+    value = np.where(idx == 1, np.minimum(value, 1.0), value)
+    return np.where(idx <= 0, 0.0, value)
+
+
+def new_sketch(shape):
+    """키 모양 shape의 빈 스케치 [*shape, N_BUCKETS]"""
+    return np.zeros(tuple(shape) + (N_BUCKETS,), dtype=np.int64)
+
+
+def sketch_add(sketch, keys, values):
+    """
+    sketch [*shape, B]에 값들을 더합니다 (제자리). keys: 각 값의 키 좌표 튜플 (shape 차원 수만큼의 배열).
+    """
+    shape = sketch.shape[:-1]
+    flat = np.ravel_multi_index(tuple(np.asarray(k, dtype=np.int64) for k in keys), shape)
+    flat = flat * N_BUCKETS + bucket_index(values)
+    sketch += np.bincount(flat.ravel(), minlength=sketch.size).reshape(sketch.shape)
+    return sketch
+
+
+def merge_sketches(*sketches):
+    """같은 모양 스케치들의 병합 (버킷별 합)"""
+    return np.sum(sketches, axis=0)
+
+
+def sketch_quantiles(sketch, qs):
+    """
+    sketch [*shape, B] -> 분위수 [*shape, len(qs)] (관측이 없는 키는 NaN)
+    rank = q * (n - 1) 번째 (0부터) 값이 들어 있는 버킷의 대표값
+    """
+    qs = np.asarray(qs, dtype=np.float64)
+    cdf = np.cumsum(sketch, axis=-1)
+    n = cdf[..., -1:]
+    rank = qs * np.maximum(n - 1, 0)                                    # [*shape, Q]
+    idx = (cdf[..., None, :] > rank[..., None]).argmax(axis=-1)         # 첫 버킷 (cdf > rank)
+    out = bucket_value(idx)
+    return np.where(n > 0, out, np.nan)
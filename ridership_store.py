@@ -0,0 +1,808 @@
+import os
+import sys
+import glob
+import json
+import hashlib
+import codecs
+import re
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# STCIS 정류장별 이용량 CSV 공용 적재 모듈
+# ------------------------------------------------------------------------------
+# raw_data/ 아래 CSV를 파일당 한 번만 파싱해서 .npz 컬럼 저장소에 캐시합니다.
+# 캐시 키는 (mtime, size) + 파일 내용 해시이며, 아무것도 바뀌지 않았으면
+# 저장된 세그먼트만 읽고 끝납니다. 새 파일이 추가된 경우에는 그 파일만
+# 파싱해서 세그먼트로 덧붙이고, 역별 최대 일자(워터마크)를 갱신합니다.
+# 모든 빌드 스크립트는 load_ridership()으로 같은 테이블을 받아 씁니다.
+#
+# 세그먼트는 PARTITION_ROWS 행이 찰 때마다 바로 디스크에 쓰므로 적재 단계의
+# 메모리는 아카이브 크기와 무관합니다. 여러 해치 아카이브를 집계할 때는
+# 전체 테이블 대신 iter_ridership()으로 파티션을 하나씩 받아 쓰면 됩니다.
+# ==============================================================================
+RAW_DATA_DIR = os.path.join(os.getcwd(), "raw_data")
+CACHE_DIR = os.path.join(os.getcwd(), ".cache", "ridership")
+
+# 캐시 포맷이 바뀌면 올려서 기존 캐시를 무효화합니다.
+STORE_VERSION = 6
+
+# 파싱 단계 프로세스 수 (기본: 머신 코어 수)
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# 세그먼트(파티션) 하나의 최대 행 수 (행당 약 23바이트 -> 약 46MB)
+PARTITION_ROWS = 2_000_000
+
+# CSV 한 개를 읽을 때 한 번에 읽는 원본 행 수
+CHUNK_ROWS = 50_000
+
+# 덧붙인 세그먼트가 이 개수를 넘으면 PARTITION_ROWS 단위로 다시 묶습니다.
+MAX_SEGMENTS = 32
+
+SEGMENT_DTYPES = {
+    'file_id': np.int32, 'station': np.int16, 'date': 'datetime64[D]',
+    'hour': np.int8, 'board': np.int32, 'alight': np.int32,
+}
+
+HOUR_RE = re.compile(r'(\d+)')
+EXPORT_DATE_RE = re.compile(r'_(\d{8})')
+
+
+def _sha256(fpath):
+    h = hashlib.sha256()
+    with open(fpath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def peak_rss_mb():
+    """이 프로세스(와 끝난 자식 프로세스)의 최대 RSS(MB). 측정할 수 없으면 None"""
+    try:
+        import resource
+    except ImportError:
+        return _peak_rss_windows()
+    # Linux는 KB, macOS는 바이트 단위
+    scale = 1 if sys.platform == 'darwin' else 1024
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak * scale / (1 << 20)
+
+
+def _peak_rss_windows():
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage',
+                    'QuotaPagedPoolUsage', 'QuotaPeakNonPagedPoolUsage',
+                    'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        ok = ctypes.windll.psapi.GetProcessMemoryInfo(
+            ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize / (1 << 20) if ok else None
+    except (AttributeError, OSError):
+        return None
+
+
+# ==============================================================================
+# 파서 (wide CSV -> long 배열)
+# ==============================================================================
+def parse_hour_columns(columns):
+    """
+    헤더에서 시간대 인덱스를 한 번만 뽑습니다.
+    구조: 정류장명, 정류장번호, 일자, 04(승차), 04(하차), 05(승차), 05(하차)...
+    반환: (승차 컬럼 위치 배열, 시간 배열). 하차는 항상 승차 바로 다음 컬럼입니다.
+    """
+    board_idx, hours = [], []
+    for col_idx in range(3, len(columns) - 1, 2):
+        m = HOUR_RE.search(str(columns[col_idx]))
+        if m:
+            board_idx.append(col_idx)
+            hours.append(int(m.group(1)))
+    return np.array(board_idx, dtype=np.intp), np.array(hours, dtype=np.int8)
+
+
+def parse_dates(values):
+    """'2024-12-15(일)' 형태의 일자 컬럼을 한 번에 datetime64[D]로 (실패는 NaT)"""
+    s = pd.Series(values).astype(str).str.slice(0, 10)
+    return pd.to_datetime(s, format='%Y-%m-%d', errors='coerce').to_numpy().astype('datetime64[D]')
+
+
+def _detect_encoding(fpath):
+    """앞부분 64KB로 cp949/utf-8 판별 (STCIS 기본은 cp949)"""
+    with open(fpath, 'rb') as f:
+        head = f.read(1 << 16)
+    try:
+        codecs.getincrementaldecoder('cp949')().decode(head, final=False)
+        return 'cp949'
+    except UnicodeDecodeError:
+        return 'utf-8'
+
+
+def _read_chunks(fpath, encoding, header, board_idx, chunk_rows):
+    """필요한 컬럼(역명, 일자, 시간대 승/하차)만 명시적 dtype으로 chunk 단위로 읽습니다."""
+    pair_idx = np.stack([board_idx, board_idx + 1], axis=1).ravel()
+    usecols = [0, 2] + pair_idx.tolist()
+    dtype = {header[0]: str, header[2]: str}
+    done = 0 # 이미 돌려준 데이터 행 수
+    try:
+        dtype.update({header[i]: np.float64 for i in pair_idx})
+        for chunk in pd.read_csv(fpath, encoding=encoding, usecols=usecols, dtype=dtype, chunksize=chunk_rows):
+            done += len(chunk)
+            yield chunk
+    except ValueError:
+        # 숫자가 아닌 값이 섞인 파일: 문자열로 다시 읽되, 이미 돌려준 앞쪽 행은 건너뛰고
+        # (실패한 chunk부터) chunk마다 숫자로 변환
+        dtype.update({header[i]: str for i in pair_idx})
+        for chunk in pd.read_csv(fpath, encoding=encoding, usecols=usecols, dtype=dtype, chunksize=chunk_rows):
+            if done >= len(chunk):
+                done -= len(chunk)
+                continue
+            chunk = chunk.iloc[done:]
+            done = 0
+            counts = chunk.iloc[:, 2:].apply(pd.to_numeric, errors='coerce')
+            yield pd.concat([chunk.iloc[:, :2], counts], axis=1)
+
+
+def _read_header(fpath):
+    encoding = _detect_encoding(fpath)
+    return encoding, pd.read_csv(fpath, encoding=encoding, nrows=0).columns
+
+
+def _iter_chunks(fpath, encoding, header, chunk_rows):
+    board_idx, hours = parse_hour_columns(header)
+    if len(hours) == 0:
+        return
+
+    for chunk in _read_chunks(fpath, encoding, header, board_idx, chunk_rows):
+        station = chunk.iloc[:, 0].astype(str).str.split('[').str[0].str.strip().to_numpy().astype(str)
+        date = parse_dates(chunk.iloc[:, 1].to_numpy())
+        keep = (station != "nan") & ~np.isnat(date)
+
+        counts = chunk.iloc[:, 2:].to_numpy(dtype=np.float64)[keep]
+        nonnumeric = int(np.isnan(counts).sum())
+        counts = np.nan_to_num(counts).astype(np.int32).reshape(-1, len(hours), 2)
+
+        n_rows, n_hours = counts.shape[0], len(hours)
+        yield {
+            'station': np.repeat(station[keep], n_hours),
+            'date': np.repeat(date[keep], n_hours),
+            'hour': np.tile(hours, n_rows),
+            'board': counts[:, :, 0].ravel(),
+            'alight': counts[:, :, 1].ravel(),
+        }, nonnumeric
+
+
+def iter_file_chunks(fpath, chunk_rows=CHUNK_ROWS):
+    """
+    CSV 한 개를 chunk_rows 행씩 (station, date, hour, board, alight) long 배열로 변환합니다.
+    chunk마다 [n행, H시간, 승/하차] 한 번의 reshape로 펼칩니다.
+    """
+    encoding, header = _read_header(fpath)
+    for arrays, _ in _iter_chunks(fpath, encoding, header, chunk_rows):
+        yield arrays
+
+
+def parse_file(fpath):
+    """
+    CSV 한 개를 (station, date, hour, board, alight) long 배열 dict로 변환합니다.
+    검증용으로 원본 헤더(header)와 숫자가 아니거나 빈 승하차 칸 수(nonnumeric)도 함께 담습니다.
+    (그런 칸은 0으로 적재됩니다)
+    """
+    encoding, header = _read_header(fpath)
+    chunks = list(_iter_chunks(fpath, encoding, header, CHUNK_ROWS))
+    if chunks:
+        arrays = {k: np.concatenate([c[k] for c, _ in chunks]) for k in chunks[0][0]}
+    else:
+        arrays = {
+            'station': np.array([], dtype=str), 'date': np.array([], dtype='datetime64[D]'),
+            'hour': np.array([], dtype=np.int8), 'board': np.array([], dtype=np.int32),
+            'alight': np.array([], dtype=np.int32),
+        }
+    arrays['header'] = np.array([str(c) for c in header], dtype=str)
+    arrays['nonnumeric'] = np.int64(sum(n for _, n in chunks))
+    return arrays
+
+
+# ==============================================================================
+# 캐시 (manifest.json + files/<sha256>.v<버전>.npz + seg-*.npz)
+# ==============================================================================
+def _load_manifest(cache_dir):
+    path = os.path.join(cache_dir, "manifest.json")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == STORE_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {'version': STORE_VERSION, 'files': {}, 'store_key': None}
+
+
+def _save_manifest(cache_dir, manifest):
+    path = os.path.join(cache_dir, "manifest.json")
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def _save_npz(path, arrays):
+    # np.savez는 확장자를 붙이므로 임시 파일도 .npz로 끝나게 합니다.
+    tmp = path[:-4] + ".tmp.npz"
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+def _scan_files(raw_dir, manifest):
+    """raw_dir의 CSV 목록과 각 파일의 내용 해시. (mtime, size)가 같으면 해시를 재사용합니다."""
+    entries = []
+    for fpath in sorted(glob.glob(os.path.join(raw_dir, "**", "*.csv"), recursive=True)):
+        rel = os.path.relpath(fpath, raw_dir)
+        st = os.stat(fpath)
+        prev = manifest['files'].get(rel)
+        if prev and prev['mtime'] == st.st_mtime_ns and prev['size'] == st.st_size:
+            sha = prev['sha256']
+        else:
+            sha = _sha256(fpath)
+        entries.append((rel, fpath, st, sha))
+    return entries
+
+
+def _unique_entries(entries, known=None):
+    """
+    내용 해시가 같은 파일(브라우저 중복 다운로드 '... (1).csv', 폴더 간 복사본)은
+    파싱하기 전에 건너뜁니다. 먼저 나온 파일(이미 적재된 파일 포함)이 남습니다.
+    반환: (남길 entries, {건너뛴 파일: 같은 내용으로 남은 파일})
+    """
+    seen = dict(known or {})
+    kept, skipped = [], {}
+    for entry in entries:
+        rel, _, _, sha = entry
+        if sha in seen:
+            skipped[rel] = seen[sha]
+            continue
+        seen[sha] = rel
+        kept.append(entry)
+    return kept, skipped
+
+
+def _file_cache_path(cache_dir, sha):
+    return os.path.join(cache_dir, "files", f"{sha}.v{STORE_VERSION}.npz")
+
+
+def _iter_file_arrays(entries, cache_dir, workers):
+    """
+    entries 순서대로 (상대경로, long 배열)을 하나씩 돌려줍니다. 캐시에 없는 파일만 파싱해서
+    받는 즉시 files/ 캐시에 저장하므로, 파싱 결과를 한꺼번에 들고 있지 않습니다.
+    workers > 1이면 ProcessPoolExecutor로 나눠 파싱하되 결과는 entries 순서로 받으므로
+    직렬 실행과 같은 저장소가 만들어집니다.
+    (entries는 _unique_entries()를 거쳐 내용 해시가 서로 다르다고 가정합니다)
+    """
+    missing = [fpath for _, fpath, _, sha in entries if not os.path.exists(_file_cache_path(cache_dir, sha))]
+
+    pool = None
+    if workers > 1 and len(missing) > 1:
+        workers = min(workers, len(missing))
+        pool = ProcessPoolExecutor(max_workers=workers)
+        parsed = pool.map(parse_file, missing, chunksize=max(1, len(missing) // (workers * 4)))
+    else:
+        parsed = map(parse_file, missing)
+
+    try:
+        for rel, _, _, sha in entries:
+            path = _file_cache_path(cache_dir, sha)
+            if os.path.exists(path):
+                with np.load(path) as z:
+                    arrays = {k: z[k] for k in z.files}
+            else:
+                arrays = next(parsed)
+                _save_npz(path, arrays)
+            yield rel, arrays
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def _header_key(header):
+    return hashlib.sha256("\x1f".join(header).encode('utf-8')).hexdigest()[:12]
+
+
+def _file_segments(entries, cache_dir, workers, manifest):
+    """
+    entries -> 파일별 세그먼트. 파일마다 원본 헤더와 비숫자 칸 수를
+    manifest['schema'] / manifest['headers']에 기록합니다 (validate_data.py용).
+    """
+    schema = manifest.setdefault('schema', {})
+    headers = manifest.setdefault('headers', {})
+    for rel, arrays in _iter_file_arrays(entries, cache_dir, workers):
+        header = arrays['header'].tolist()
+        key = _header_key(header)
+        headers[key] = header
+        schema[rel] = {'header': key, 'nonnumeric': int(arrays['nonnumeric'])}
+        yield _file_segment(rel, arrays)
+
+
+def read_file_schema(cache_dir=CACHE_DIR):
+    """
+    적재된 파일별 스키마 정보. 반환: ({상대경로: {'header': 헤더 키, 'nonnumeric': 칸 수}}, {헤더 키: 컬럼 목록})
+    내용이 같아 건너뛴 파일은 포함되지 않습니다.
+    """
+    manifest = _load_manifest(cache_dir)
+    return manifest.get('schema', {}), manifest.get('headers', {})
+
+
+def read_skipped_duplicates(cache_dir=CACHE_DIR):
+    """내용이 같아 건너뛴 파일 {건너뛴 파일: 남은 파일}"""
+    return dict(_load_manifest(cache_dir).get('duplicates', {}))
+
+
+def _empty_segment():
+    seg = {k: np.array([], dtype=t) for k, t in SEGMENT_DTYPES.items()}
+    seg['stations'] = np.array([], dtype=str)
+    seg['files'] = np.array([], dtype=str)
+    return seg
+
+
+def _file_segment(rel, arrays):
+    """파일 한 개의 long 배열 -> 세그먼트 (역명은 코드로)"""
+    names, inverse = np.unique(arrays['station'], return_inverse=True)
+    seg = {k: arrays[k] for k in ('date', 'hour', 'board', 'alight')}
+    seg['station'] = inverse.astype(np.int16)
+    seg['file_id'] = np.zeros(len(inverse), dtype=np.int32)
+    seg['stations'] = names
+    seg['files'] = np.array([rel], dtype=str)
+    return seg
+
+
+def _merge_segments(segments):
+    """세그먼트 여러 개를 하나로 합칩니다. 역/파일 코드는 등장 순서대로 다시 매깁니다."""
+    if not segments:
+        return _empty_segment()
+    if len(segments) == 1:
+        return segments[0]
+
+    stations, files = [], []
+    station_idx = {}
+    cols = {k: [] for k in SEGMENT_DTYPES}
+    for seg in segments:
+        for name in seg['stations']:
+            if name not in station_idx:
+                station_idx[name] = len(stations)
+                stations.append(name)
+        lookup = np.array([station_idx[name] for name in seg['stations']], dtype=np.int16)
+        cols['station'].append(lookup[seg['station']] if len(lookup) else seg['station'])
+        cols['file_id'].append(seg['file_id'] + len(files))
+        files.extend(seg['files'].tolist())
+        for k in ('date', 'hour', 'board', 'alight'):
+            cols[k].append(seg[k])
+
+    store = {k: np.concatenate(v).astype(SEGMENT_DTYPES[k]) for k, v in cols.items()}
+    store['stations'] = np.array(stations, dtype=str)
+    store['files'] = np.array(files, dtype=str)
+    return store
+
+
+def _station_watermarks(store, marks=None):
+    """역별 최대 일자 {역명: 'YYYY-MM-DD'} (marks가 있으면 그 위에 갱신)"""
+    marks = dict(marks or {})
+    for code, name in enumerate(store['stations']):
+        dates = store['date'][store['station'] == code]
+        if len(dates):
+            d = str(dates.max())
+            marks[str(name)] = max(d, marks.get(str(name), d))
+    return marks
+
+
+def read_watermarks(cache_dir=CACHE_DIR):
+    """
+    직전 적재 시점의 역별 최대 일자. load_ridership() 전에 읽어 두면
+    이번 실행에서 새로 들어온 날짜(워터마크 이후)만 골라 처리할 수 있습니다.
+    """
+    return {st: np.datetime64(d) for st, d in _load_manifest(cache_dir).get('watermarks', {}).items()}
+
+
+def _segment_path(cache_dir, name):
+    return os.path.join(cache_dir, name)
+
+
+def _load_segment(cache_dir, name, keys=None):
+    with np.load(_segment_path(cache_dir, name)) as z:
+        return {k: z[k] for k in (keys or z.files)}
+
+
+def _write_segment(cache_dir, manifest, store):
+    name = f"seg-{manifest.get('next_segment', 0):05d}.npz"
+    manifest['next_segment'] = manifest.get('next_segment', 0) + 1
+    _save_npz(_segment_path(cache_dir, name), store)
+    return name
+
+
+def _write_partitions(segments, cache_dir, manifest, partition_rows, marks=None):
+    """
+    세그먼트 조각들을 모아 partition_rows 행이 넘을 때마다 바로 디스크에 씁니다.
+    메모리에는 파티션 하나 분량만 남습니다. 파일 하나가 두 파티션으로 나뉘지는 않습니다.
+    반환: (세그먼트 이름 목록, 갱신된 워터마크)
+    """
+    names, buffer, buffered = [], [], 0
+
+    def flush():
+        nonlocal marks
+        merged = _merge_segments(buffer)
+        marks = _station_watermarks(merged, marks)
+        names.append(_write_segment(cache_dir, manifest, merged))
+
+    for seg in segments:
+        buffer.append(seg)
+        buffered += len(seg['date'])
+        if buffered >= partition_rows:
+            flush()
+            buffer, buffered = [], 0
+    if buffer or not names:
+        flush()
+    return names, marks or {}
+
+
+def _drop_segments(cache_dir, keep):
+    for path in glob.glob(os.path.join(cache_dir, "seg-*.npz")):
+        if os.path.basename(path) not in keep:
+            os.remove(path)
+
+
+def _update_store(raw_dir, cache_dir, workers, partition_rows):
+    """
+    세그먼트(seg-*.npz) 목록을 raw_dir 현재 상태에 맞추고 manifest를 반환합니다.
+    - 변경 없음: 아무것도 하지 않음
+    - 기존 파일은 그대로이고 새 파일만 추가: 새 파일만 파싱해서 세그먼트를 덧붙임
+    - 파일 수정/삭제, 또는 새 파일이 이미 적재된 같은 내용 파일보다 경로 순서가 앞섬:
+      전체 재구성 (파일 단위 캐시는 그대로 재사용)
+    덧붙인 세그먼트의 행은 전체 재구성 때의 파일명 순서가 아니라 도착 순서로 놓입니다.
+    """
+    if workers is None:
+        workers = DEFAULT_WORKERS
+    os.makedirs(os.path.join(cache_dir, "files"), exist_ok=True)
+    manifest = _load_manifest(cache_dir)
+    entries = _scan_files(raw_dir, manifest)
+
+    key_src = "\n".join(f"{rel}\t{sha}" for rel, _, _, sha in entries)
+    store_key = hashlib.sha256(key_src.encode('utf-8')).hexdigest()
+
+    prev_files = {rel: info['sha256'] for rel, info in manifest['files'].items()}
+    current_files = {rel: sha for rel, _, _, sha in entries}
+    segment_names = manifest.get('segments', [])
+    have_segments = bool(segment_names) and all(
+        os.path.exists(_segment_path(cache_dir, name)) for name in segment_names)
+    only_added = all(current_files.get(rel) == sha for rel, sha in prev_files.items())
+    duplicates = manifest.get('duplicates', {})
+    known = {sha: rel for rel, sha in prev_files.items() if rel not in duplicates}
+    # 새 파일이 이미 적재된 같은 내용 파일보다 경로 순서가 앞서면, 전체 재구성이었다면 새 파일이 남음
+    # (파일명 export 날짜가 중복 정리 우선순위에 쓰이므로 증분으로 이어 붙이지 않고 재구성)
+    relabel = any(sha in known and rel < known[sha] for rel, sha in current_files.items() if rel not in prev_files)
+
+    if have_segments and manifest.get('store_key') == store_key:
+        return manifest
+    elif have_segments and only_added and not relabel:
+        manifest['last_update'] = "append"
+        new_entries, skipped = _unique_entries([e for e in entries if e[0] not in prev_files], known)
+        duplicates.update(skipped)
+        added = _file_segments(new_entries, cache_dir, workers, manifest)
+        added_names, manifest['watermarks'] = _write_partitions(
+            added, cache_dir, manifest, partition_rows, manifest.get('watermarks'))
+        added_rows = sum(len(_load_segment(cache_dir, name, ['date'])['date']) for name in added_names)
+        segment_names = segment_names + added_names
+        print(f"📦 새 파일 {len(new_entries)}개만 적재 (+{added_rows}행, 중복 파일 {len(skipped)}개 건너뜀)")
+
+        if len(segment_names) > MAX_SEGMENTS:
+            # 세그먼트가 너무 많아지면 partition_rows 단위로 다시 묶어 둡니다 (재파싱 없음)
+            segment_names, _ = _write_partitions(
+                (_load_segment(cache_dir, name) for name in segment_names), cache_dir, manifest, partition_rows)
+    else:
+        manifest['last_update'] = "rebuild"
+        unique, duplicates = _unique_entries(entries)
+        manifest['schema'], manifest['headers'] = {}, {}
+        per_file = _file_segments(unique, cache_dir, workers, manifest)
+        segment_names, manifest['watermarks'] = _write_partitions(per_file, cache_dir, manifest, partition_rows)
+        print(f"📦 raw_data 적재: 파일 {len(unique)}개 (내용이 같은 중복 파일 {len(duplicates)}개 건너뜀)")
+
+    _drop_segments(cache_dir, segment_names)
+    manifest['duplicates'] = duplicates
+    manifest['segments'] = segment_names
+    manifest['files'] = {
+        rel: {'mtime': st.st_mtime_ns, 'size': st.st_size, 'sha256': sha}
+        for rel, _, st, sha in entries
+    }
+    manifest['store_key'] = store_key
+    _save_manifest(cache_dir, manifest)
+    return manifest
+
+
+# ==============================================================================
+# 겹치는 (역, 일자) 정리
+# ==============================================================================
+def _file_precedence(files):
+    """
+    (역, 일자)가 여러 파일에 겹칠 때의 우선순위 (작을수록 우선).
+    1) 파일명의 STCIS 내려받은 날짜(_YYYYMMDD)가 최신인 파일 (정정된 값이 반영된 최신 export)
+    2) 같으면 raw_data 기준 상대경로 순서가 앞선 파일
+    반환: {상대경로: 순위}
+    """
+    keys = []
+    for rel in files:
+        m = EXPORT_DATE_RE.search(os.path.basename(str(rel)))
+        keys.append((-int(m.group(1)) if m else 0, str(rel)))
+    return {rel: rank for rank, (_, rel) in enumerate(sorted(keys))}
+
+
+class _Deduper:
+    """
+    같은 (역, 일자)가 여러 파일에 있으면 우선순위가 가장 높은 파일의 행만 남기고,
+    한 파일 안에서 (역, 일자, 시간)이 반복되면 처음 행만 남깁니다.
+    세그먼트 단위 2-pass라서 메모리는 (역, 일자) 키 개수에만 비례합니다.
+    1차 observe(): 세그먼트마다 (역, 일자)별 최고 우선순위만 모음
+    2차 filter(): 세그먼트마다 이긴 파일의 행만 남김
+    """
+
+    def __init__(self, stations, files):
+        self.station_idx = {}
+        for name in stations:
+            self.station_idx.setdefault(str(name), len(self.station_idx))
+        self.rank_of = _file_precedence(files)
+        self.best_keys = np.array([], dtype=np.int64)
+        self.best_ranks = np.array([], dtype=np.int64)
+        self.report = {'rows_dropped': 0, 'station_dates': 0, 'by_file': {}}
+        self._dropped_keys = []
+
+    def _keys(self, seg):
+        """세그먼트 각 행의 전역 (역, 일자) 키와 파일 우선순위"""
+        lookup = np.array([self.station_idx[str(name)] for name in seg['stations']], dtype=np.int64)
+        station = lookup[seg['station']] if len(lookup) else seg['station'].astype(np.int64)
+        key = station * (1 << 32) + seg['date'].astype(np.int64) + (1 << 31)
+        file_rank = np.array([self.rank_of[str(rel)] for rel in seg['files']], dtype=np.int64)
+        rank = file_rank[seg['file_id']] if len(file_rank) else seg['file_id'].astype(np.int64)
+        return key, rank
+
+    def observe(self, seg):
+        key, rank = self._keys(seg)
+        keys = np.concatenate([self.best_keys, key])
+        ranks = np.concatenate([self.best_ranks, rank])
+        order = np.lexsort((ranks, keys))
+        keys, ranks = keys[order], ranks[order]
+        first = np.r_[True, keys[1:] != keys[:-1]] if len(keys) else np.array([], dtype=bool)
+        self.best_keys, self.best_ranks = keys[first], ranks[first]
+
+    def filter(self, seg):
+        n = len(seg['date'])
+        if n == 0:
+            return seg
+        key, rank = self._keys(seg)
+        winner = self.best_ranks[np.searchsorted(self.best_keys, key)] == rank
+        kept = np.flatnonzero(winner)
+        # 이긴 파일은 한 세그먼트 안에 통째로 있으므로 (키, 시간) 중복도 세그먼트 안에서만 보면 됩니다.
+        _, first = np.unique(key[kept] * 32 + seg['hour'][kept], return_index=True)
+        kept = kept[np.sort(first)]
+        if len(kept) == n:
+            return seg
+
+        dropped = np.ones(n, dtype=bool)
+        dropped[kept] = False
+        self.report['rows_dropped'] += int(dropped.sum())
+        self._dropped_keys.append(np.unique(key[dropped]))
+        ids, counts = np.unique(seg['file_id'][dropped], return_counts=True)
+        by_file = self.report['by_file']
+        for i, c in zip(ids, counts):
+            rel = str(seg['files'][i])
+            by_file[rel] = by_file.get(rel, 0) + int(c)
+
+        seg = dict(seg)
+        for k in SEGMENT_DTYPES:
+            seg[k] = seg[k][kept]
+        return seg
+
+    def finish(self):
+        if self._dropped_keys:
+            self.report['station_dates'] = int(len(np.unique(np.concatenate(self._dropped_keys))))
+        return self.report
+
+
+def dedup_rows(store):
+    """메모리에 올린 store 하나에 _Deduper 규칙을 적용합니다. 반환: (정리된 store, 보고서 dict)"""
+    deduper = _Deduper(store['stations'], store['files'])
+    deduper.observe(store)
+    store = deduper.filter(store)
+    return store, deduper.finish()
+
+
+def _report_dedup(cache_dir, manifest, report):
+    if report['rows_dropped'] and report != manifest.get('dedup'):
+        print(f"🧹 겹치는 (역, 일자) {report['station_dates']}건 정리: {report['rows_dropped']}행 제외")
+        for rel, count in sorted(report['by_file'].items()):
+            print(f"   - {rel}: {count}행")
+    if report != manifest.get('dedup'):
+        manifest['dedup'] = report
+        _save_manifest(cache_dir, manifest)
+
+
+# ==============================================================================
+# 공개 API
+# ==============================================================================
+def _to_frame(store):
+    return pd.DataFrame({
+        'file': pd.Categorical.from_codes(store['file_id'], categories=store['files']),
+        'station': pd.Categorical.from_codes(store['station'], categories=store['stations']),
+        'date': store['date'].astype('datetime64[s]'),
+        'hour': store['hour'].astype(np.int8),
+        'board': store['board'].astype(np.int32),
+        'alight': store['alight'].astype(np.int32),
+    })
+
+
+def load_ridership(raw_dir=RAW_DATA_DIR, cache_dir=CACHE_DIR, workers=None, dedup=True,
+                   partition_rows=PARTITION_ROWS):
+    """
+    raw_data 전체를 long 테이블 하나로 반환합니다.
+    컬럼: file(상대경로), station(정제된 역명), date, hour, board, alight
+    workers: 파싱 프로세스 수 (None이면 CPU 코어 수, 1이면 직렬)
+    dedup: 겹치는 (역, 일자) 행을 _Deduper 규칙으로 정리 (내용이 같은 파일은 항상 건너뜀)
+    """
+    manifest = _update_store(raw_dir, cache_dir, workers, partition_rows)
+    store = _merge_segments([_load_segment(cache_dir, name) for name in manifest['segments']])
+    if dedup:
+        store, report = dedup_rows(store)
+        _report_dedup(cache_dir, manifest, report)
+    return _to_frame(store)
+
+
+def iter_ridership(raw_dir=RAW_DATA_DIR, cache_dir=CACHE_DIR, workers=None, dedup=True,
+                   partition_rows=PARTITION_ROWS):
+    """
+    load_ridership()와 같은 행을 파티션(세그먼트) 단위 DataFrame으로 차례로 돌려줍니다.
+    한 번에 파티션 하나만 메모리에 올라오므로 여러 해치 아카이브도 일정한 메모리로 집계할 수 있습니다.
+    파티션마다 station/file 카테고리 순서가 다를 수 있으니 역명(문자열) 기준으로 집계하세요.
+    """
+    manifest = _update_store(raw_dir, cache_dir, workers, partition_rows)
+    names = manifest['segments']
+
+    deduper = None
+    if dedup:
+        meta = [_load_segment(cache_dir, name, ['stations', 'files']) for name in names]
+        deduper = _Deduper(np.concatenate([m['stations'] for m in meta]),
+                           np.concatenate([m['files'] for m in meta]))
+        for name in names:
+            deduper.observe(_load_segment(cache_dir, name, ['station', 'date', 'file_id', 'stations', 'files']))
+
+    for name in names:
+        seg = _load_segment(cache_dir, name)
+        if deduper is not None:
+            seg = deduper.filter(seg)
+        yield _to_frame(seg)
+
+    if deduper is not None:
+        _report_dedup(cache_dir, manifest, deduper.finish())
+
+
+def _canonical(table):
+    """행 순서 / 카테고리 순서와 무관하게 비교할 수 있는 형태"""
+    out = table.astype({'station': str, 'file': str}).sort_values(['file', 'station', 'date', 'hour'], kind='stable')
+    return out[['file', 'station', 'date', 'hour', 'board', 'alight']].reset_index(drop=True)
+
+
+def check_store(raw_dir=RAW_DATA_DIR, workers=None, partition_rows=5000):
+    """
+    저장소 자체 점검 (manifest / 중복 정리 / 증분 적재를 고친 뒤 실행):
+      - 처음 적재 == 캐시에서 다시 읽기 == 직렬(workers=1) 적재
+      - 파일 절반 적재 후 나머지 추가 (증분 + 세그먼트 재묶음) == 전체 재구성
+      - iter_ridership 파티션을 이은 것 == load_ridership
+      - dedup=False 행 수 >= dedup 행 수
+    모두 임시 폴더에서 하므로 .cache/ridership은 건드리지 않습니다.
+    """
+    import shutil
+    import tempfile
+    results = []
+
+    def same(name, a, b):
+        ok = _canonical(a).equals(_canonical(b))
+        results.append(ok)
+        print(f"  {'✅' if ok else '❌'} {name} ({len(a)}행 / {len(b)}행)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cold = load_ridership(raw_dir, os.path.join(tmp, "a"), workers, partition_rows=partition_rows)
+        if cold.empty:
+            print("❌ CSV 파일 없음.")
+            return False
+        same("처음 적재 == 캐시 재사용", cold,
+             load_ridership(raw_dir, os.path.join(tmp, "a"), workers, partition_rows=partition_rows))
+        same("병렬 == 직렬", cold, load_ridership(raw_dir, os.path.join(tmp, "b"), 1, partition_rows=partition_rows))
+        same("iter_ridership == load_ridership", cold, pd.concat(
+            [_canonical(p) for p in iter_ridership(raw_dir, os.path.join(tmp, "a"), workers,
+                                                   partition_rows=partition_rows)]))
+
+        # 증분: 일부 파일을 빼고 적재한 뒤 몇 번에 나눠 되돌려 놓음 (copytree = copy2라 mtime 유지)
+        files = sorted(os.path.relpath(f, raw_dir)
+                       for f in glob.glob(os.path.join(raw_dir, "**", "*.csv"), recursive=True))
+        half = len(files) // 2
+        scenarios = [
+            # 경로 순서 뒤쪽 절반을 순서대로 4번에 나눠 추가 -> 덧붙이기 + 세그먼트 재묶음 (MAX_SEGMENTS를 잠시 낮춤)
+            ("증분 덧붙이기 + 재묶음", [list(b) for b in np.array_split(files[half:], 4)], True),
+            # 하나 걸러 뺀 파일 추가 -> 같은 내용의 앞선 경로가 들어오므로 전체 재구성
+            ("앞선 경로의 중복 파일 추가", [files[1::2]], False),
+        ]
+        global MAX_SEGMENTS
+        max_segments = MAX_SEGMENTS
+        for k, (name, batches, appends) in enumerate(scenarios):
+            part_raw, held = os.path.join(tmp, f"raw{k}"), os.path.join(tmp, f"held{k}")
+            shutil.copytree(raw_dir, part_raw)
+            for rel in (rel for batch in batches for rel in batch):
+                os.makedirs(os.path.dirname(os.path.join(held, rel)), exist_ok=True)
+                shutil.move(os.path.join(part_raw, rel), os.path.join(held, rel))
+            cache = os.path.join(tmp, f"inc{k}")
+            MAX_SEGMENTS = 4 if appends else max_segments
+            try:
+                load_ridership(part_raw, cache, workers, partition_rows=partition_rows)
+                modes = set()
+                for batch in batches:
+                    for rel in batch:
+                        shutil.move(os.path.join(held, rel), os.path.join(part_raw, rel))
+                    incremental = load_ridership(part_raw, cache, workers, partition_rows=partition_rows)
+                    modes.add(_load_manifest(cache).get('last_update'))
+            finally:
+                MAX_SEGMENTS = max_segments
+            path = "/".join(sorted(modes))
+            if modes != ({"append"} if appends else {"rebuild"}):
+                print(f"  ❌ {name}: 예상과 다른 적재 방식 ({path})")
+                results.append(False)
+            same(f"{name} ({path}) == 전체 재구성", incremental,
+                 load_ridership(part_raw, os.path.join(tmp, f"full{k}"), workers, partition_rows=partition_rows))
+
+        raw_rows = len(load_ridership(raw_dir, os.path.join(tmp, "a"), workers, dedup=False,
+                                      partition_rows=partition_rows))
+        ok = raw_rows >= len(cold)
+        results.append(ok)
+        print(f"  {'✅' if ok else '❌'} 중복 정리 전 {raw_rows}행 >= 정리 후 {len(cold)}행")
+    return all(results)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description="raw_data CSV -> .cache/ridership 적재")
+    parser.add_argument("--raw-dir", default=RAW_DATA_DIR, help="CSV 폴더 (기본: raw_data)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="저장소 폴더 (기본: .cache/ridership)")
+    parser.add_argument("--workers", type=int, default=None, help="파싱 프로세스 수 (기본: CPU 코어 수)")
+    parser.add_argument("--stream", action="store_true",
+                        help="전체 테이블 대신 파티션 단위로 읽으며 (역, 시간) 합계만 집계")
+    parser.add_argument("--partition-rows", type=int, default=PARTITION_ROWS, help="세그먼트 하나의 최대 행 수")
+    parser.add_argument("--check", action="store_true",
+                        help="저장소 자체 점검 (처음/캐시/직렬 적재, 증분 추가 == 전체 재구성)만 실행")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(0 if check_store(args.raw_dir, args.workers) else 1)
+
+    before = read_watermarks(args.cache_dir)
+    t0 = time.time()
+    if args.stream:
+        totals, n_rows = None, 0
+        for part in iter_ridership(args.raw_dir, args.cache_dir, args.workers, partition_rows=args.partition_rows):
+            agg = part.groupby([part['station'].astype(str), 'hour'])[['board', 'alight']].sum()
+            totals = agg if totals is None else totals.add(agg, fill_value=0)
+            n_rows += len(part)
+        n_stations = 0 if totals is None else totals.index.get_level_values(0).nunique()
+        print(f"Streamed {n_rows} rows ({n_stations} stations) in {time.time() - t0:.2f}s")
+    else:
+        table = load_ridership(args.raw_dir, args.cache_dir, args.workers, partition_rows=args.partition_rows)
+        print(f"Loaded {len(table)} rows from {table['file'].nunique()} files "
+              f"({table['station'].nunique()} stations) in {time.time() - t0:.2f}s")
+    for st, mark in read_watermarks(args.cache_dir).items():
+        prev = before.get(st)
+        note = f" (이전 {prev})" if prev is not None and prev != mark else ""
+        print(f"  {st}: ~{mark}{note}")
+
+    peak = peak_rss_mb()
+    print(f"Peak RSS: {peak:.1f} MB" if peak is not None else "Peak RSS: n/a")
@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+import pickle
+import argparse
+import importlib.util
+import numpy as np
+
+# ==============================================================================
+# scripts/data_collector.py 일자 유형별 모델 벤치마크
+# ------------------------------------------------------------------------------
+# 같은 ML 학습 데이터(parse_and_transform 결과)를 날짜 기준으로 나눠
+# (앞쪽 학습 / 마지막 --test-frac 검증) 방식별 학습/예측 시간과 정확도를 비교합니다.
+#   two_model : 일자 유형마다 승차, 하차 RandomForest 파이프라인 2개 (예전 방식, 16 forest)
+#   multi     : 일자 유형마다 다중 출력 RandomForest 1개 (전처리 한 번, 8 forest)
+#   hgb       : 일자 유형마다 승차, 하차 HistGradientBoosting 2개 (역명/시간/월 범주형 그대로)
+# 모델 크기는 pickle 직렬화 크기입니다.
+#
+# 예) python scripts/benchmark_models.py --days 120 --n-estimators 50
+# ==============================================================================
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = {"two_model": dict(engine="forest", multi_output=False),
+         "multi": dict(engine="forest", multi_output=True),
+         "hgb": dict(engine="hgb")}
+
+
+def _load_collector():
+    # 최상위 data_collector.py와 이름이 겹치므로 경로로 불러옴
+    spec = importlib.util.spec_from_file_location("collector_v4", os.path.join(ROOT, "scripts", "data_collector.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_ml_frame(collector, days=None):
+    traffic = collector.load_traffic_data()
+    if traffic is None:
+        sys.exit(1)
+    if days:
+        start = traffic['date'].max() - np.timedelta64(days - 1, 'D')
+        traffic = traffic[traffic['date'] >= start]
+    years = traffic['date'].dt.year
+    holidays_map = collector.get_korean_holidays(int(years.min()), int(years.max()))
+    return collector.parse_and_transform(traffic, collector.load_weather_data(), holidays_map)
+
+
+def split_by_date(df, test_frac):
+    days = np.sort(df['날짜'].unique())
+    cut = days[int(len(days) * (1 - test_frac))]
+    return df[df['날짜'] < cut], df[df['날짜'] >= cut]
+
+
+def run_mode(collector, name, train, test, rf_params):
+    t0 = time.perf_counter()
+    models = collector.fit_day_type_models(train, rf_params=rf_params, **MODES[name])
+    t_fit = time.perf_counter() - t0
+    size_mb = len(pickle.dumps(models, protocol=pickle.HIGHEST_PROTOCOL)) / 1e6
+
+    t0 = time.perf_counter()
+    pred = np.zeros((len(test), len(collector.TARGETS)))
+    covered = np.zeros(len(test), dtype=bool)
+    for day_type in collector.MODEL_TYPES:
+        mask = (test['day_type'] == day_type).to_numpy()
+        if not mask.any(): continue
+        p = collector.predict_day_type(models, day_type, test[mask])
+        if p is None: continue
+        pred[mask] = p
+        covered[mask] = True
+    t_pred = time.perf_counter() - t0
+
+    y = test[collector.TARGETS].to_numpy()[covered]
+    err = pred[covered] - y
+    mae = np.abs(err).mean(axis=0)
+    rmse = np.sqrt((err ** 2).mean(axis=0))
+    r2 = 1 - (err ** 2).sum(axis=0) / ((y - y.mean(axis=0)) ** 2).sum(axis=0)
+    return {"fit": t_fit, "predict": t_pred, "size": size_mb, "mae": mae, "rmse": rmse, "r2": r2,
+            "n": int(covered.sum())}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="일자 유형별 모델 방식 비교 (학습/예측 시간, 정확도)")
+    parser.add_argument("--days", type=int, default=None, help="최근 N일만 사용 (기본: 전체)")
+    parser.add_argument("--test-frac", type=float, default=0.2, help="검증용 마지막 일자 비율")
+    parser.add_argument("--n-estimators", type=int, default=None, help="forest 트리 수 (기본: RF_PARAMS)")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    collector = _load_collector()
+    rf_params = dict(collector.RF_PARAMS)
+    if args.n_estimators:
+        rf_params['n_estimators'] = args.n_estimators
+
+    df = load_ml_frame(collector, args.days)
+    train, test = split_by_date(df, args.test_frac)
+    print(f"학습 {len(train)}행 / 검증 {len(test)}행, RandomForest {rf_params}")
+
+    print(f"{'mode':<10} {'fit(s)':>8} {'pred(s)':>8} {'size(MB)':>9} {'MAE 승/하':>14} {'RMSE 승/하':>14} {'R2 승/하':>12}")
+    for name in args.modes:
+        r = run_mode(collector, name, train, test, rf_params)
+        print(f"{name:<10} {r['fit']:8.2f} {r['predict']:8.3f} {r['size']:9.1f} "
+              f"{r['mae'][0]:6.1f}/{r['mae'][1]:<6.1f} {r['rmse'][0]:6.1f}/{r['rmse'][1]:<6.1f} "
+              f"{r['r2'][0]:5.3f}/{r['r2'][1]:<5.3f}")
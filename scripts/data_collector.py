@@ -1,21 +1,26 @@
 import pandas as pd
-import glob
 import json
 import os
 import re
+import sys
 from datetime import datetime
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
 from sklearn.preprocessing import OneHotEncoder
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
 import holidays
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ridership_store import load_ridership
+from model_registry import fingerprint, cached_model
+
 # --- 1. 설정 및 파일 경로 (V4는 API 호출을 멈추고 파일 학습으로 전환) ---
 
 RAW_DATA_DIR = 'raw_data'
 STATIC_TIMETABLE_FILE = 'data/timetable.json'
-OUTPUT_DATA_JSON = 'data.json'
+# data.json(날짜별 혼잡도, predict.js용)은 build_all.py / daily_update.yml이 만들므로 V4 결과는 별도 파일로
+OUTPUT_DATA_JSON = 'data_v4.json'
 # 교통량 파일은 폴더 내 모든 CSV를 읽으므로, 파일 이름을 지정하지 않습니다.
 WEATHER_DATA_FILE = os.path.join(RAW_DATA_DIR, 'weather_1year.csv') # 1년치 날씨 데이터 파일명 (DAY 2-5에 준비)
 
@@ -25,6 +30,11 @@ STATION_MAP = {
     '양촌': '양촌역', '양촌역': '양촌역', '운양': '운양역',
     '장기': '장기역', '풍무': '풍무역'
 }
+# RandomForest 하이퍼파라미터 (모델 저장소 키에도 들어감)
+RF_PARAMS = dict(n_estimators=100, random_state=42, n_jobs=-1, min_samples_leaf=2)
+# HistGradientBoosting 하이퍼파라미터 (MODEL_ENGINE = 'hgb'일 때)
+HGB_PARAMS = dict(max_iter=300, learning_rate=0.1, max_leaf_nodes=31, min_samples_leaf=20,
+                  early_stopping=False, random_state=42)
 DAY_EXTRACT_RE = re.compile(r'\((일|월|화|수|목|금|토)\)')
 
 # --- 2. 데이터 로드 및 전처리 ---
@@ -38,29 +48,17 @@ def load_static_timetable(file_path):
 
 def load_traffic_data():
     """ 
-    [V4 핵심] raw_data 폴더 내의 모든 CSV 파일을 읽어와 하나로 합칩니다. 
-    (파일 이름에 관계 없이 모든 데이터를 통합)
+    [V4 핵심] raw_data 폴더 내의 모든 CSV를 ridership_store 캐시에서 읽어옵니다.
+    (새로 추가된 파일만 파싱되고, 나머지는 캐시된 long 테이블을 그대로 사용)
     """
+    table = load_ridership(RAW_DATA_DIR)
     
-    # glob: 폴더 내의 모든 CSV 파일 경로를 찾습니다.
-    csv_files = glob.glob(os.path.join(RAW_DATA_DIR, '*.csv'))
-    
-    if not csv_files:
+    if table.empty:
         print(f"FATAL ERROR: Traffic data CSVs not found in {RAW_DATA_DIR}")
         return None
         
-    df_list = []
-    
-    # 찾은 모든 파일을 순회하며 읽어옵니다. (한글 인코딩 처리 포함)
-    for f in csv_files:
-        try:
-            df = pd.read_csv(f, encoding='cp949')
-        except:
-            df = pd.read_csv(f, encoding='utf-8')
-        df_list.append(df)
-        
-    # 모든 파일을 하나의 DataFrame으로 합치고 중복을 제거합니다.
-    return pd.concat(df_list, ignore_index=True).drop_duplicates() if df_list else None
+    # 중복 파일/겹치는 일자는 ridership_store에서 이미 정리되어 있습니다.
+    return table.drop(columns='file')
 
 def load_weather_data():
     """ weather_1year.csv 파일을 로드하고 필요한 컬럼만 추출합니다. """
@@ -87,85 +85,172 @@ def get_korean_holidays(start_year, end_year):
     kr_holidays = holidays.KR(prov=None, years=range(start_year, end_year + 2))
     return set(kr_holidays.keys())
 
+DOW_NAMES = ['월', '화', '수', '목', '금', '토', '일']
+DAY_TYPES = DOW_NAMES + ['공휴일']
+WEATHER_FEATURES = ['AvgTemp', 'Rainfall', 'Snow']
+
 def parse_and_transform(traffic_df, weather_df, holidays_map):
-    # 1. 교통 데이터 전처리 (기존 로직 유지)
-    id_vars = ['정류장명', '일자']
-    value_vars = [col for col in traffic_df.columns if '승차' in col or '하차' in col]
-    long_df = pd.melt(traffic_df, id_vars=id_vars, value_vars=value_vars, var_name='시간_유형', value_name='인원')
-    long_df['시간'] = long_df['시간_유형'].str.slice(0, 2)
-    long_df['유형'] = long_df['시간_유형'].str.contains('승차').map({True: '승차', False: '하차'})
-    long_df['날짜'] = pd.to_datetime(long_df['일자'].str.split('(').str[0], format='%Y-%m-%d', errors='coerce')
-    long_df = long_df.dropna(subset=['날짜'])
-    long_df['요일'] = long_df['날짜'].dt.dayofweek.map({0:'월', 1:'화', 2:'수', 3:'목', 4:'금', 5:'토', 6:'일'})
-    long_df['역명'] = long_df['정류장명'].str.split(' ').str[0].map(STATION_MAP)
-    
-    # 2. 날씨 데이터 병합 (V4 핵심)
+    """
+    ridership_store long 테이블 (역, 일자, 시간, 승차, 하차 - 이미 (역, 일자, 시간)당 한 행) -> ML 학습 행렬.
+    melt / pivot_table 없이 컬럼만 붙입니다. 역명 / 요일 / day_type은 category,
+    day_type은 요일 코드와 공휴일 여부 배열로 한 번에 계산합니다.
+    행 순서는 (날짜, 역명, 시간) 정렬.
+    """
+    # 1. 골드라인 역명 (STATION_MAP에 없는 정류장은 제외)
+    station = traffic_df['station'].astype(str).map(STATION_MAP)
+    keep = station.notna().to_numpy()
+    date = traffic_df['date'].to_numpy()[keep].astype('datetime64[D]')
+    station_names = sorted(set(STATION_MAP.values()))
+    station_code = pd.Categorical(station[keep], categories=station_names).codes
+
+    # 2. 날씨 (날짜별 값을 일자 인덱스로 가져옴, 날씨 행이 없는 날짜는 학습에서 제외)
+    days, day_idx = np.unique(date, return_inverse=True)
     if weather_df is not None:
-        long_df = pd.merge(long_df, weather_df, on='날짜', how='left')
+        weather = (weather_df.assign(날짜=weather_df['날짜'].to_numpy().astype('datetime64[D]'))
+                   .drop_duplicates('날짜').set_index('날짜')[WEATHER_FEATURES]
+                   .reindex(days).to_numpy(dtype=np.float64))
     else:
         # 날씨 데이터가 없으면 0으로 채움 (ML 코드가 작동하게 하기 위해)
-        long_df['AvgTemp'] = 0
-        long_df['Rainfall'] = 0
-        long_df['Snow'] = 0
+        weather = np.zeros((len(days), len(WEATHER_FEATURES)), dtype=np.int64)
+    has_weather = ~np.isnan(weather).any(axis=1) if weather.dtype.kind == 'f' else np.ones(len(days), dtype=bool)
 
-    # 3. ML 학습 형태 변환
-    final_df = long_df.pivot_table(index=['날짜', '역명', '요일', 'AvgTemp', 'Rainfall', 'Snow'], columns='시간', values='인원', aggfunc='first').reset_index()
-    
-    def get_day_type(row):
-        if row['날짜'].date() in holidays_map: return '공휴일'
-        return row['요일']
-    final_df['day_type'] = final_df.apply(get_day_type, axis=1)
-    
-    final_df['days_since_start'] = (final_df['날짜'] - final_df['날짜'].min()).dt.days
-    final_df['월'] = final_df['날짜'].dt.month
+    # 3. 일자 유형: 요일 코드 (월=0), 공휴일이면 7
+    dow = (days.astype(np.int64) + 3) % 7  # 1970-01-01 = 목요일
+    holiday = np.isin(days, np.array(sorted(holidays_map), dtype='datetime64[D]'))
+    day_type = np.where(holiday, len(DOW_NAMES), dow)
 
-    ml_ready_df = final_df.melt(id_vars=['날짜', '역명', '요일', 'day_type', 'days_since_start', '월', 'AvgTemp', 'Rainfall', 'Snow'], 
-                                value_vars=[col for col in final_df.columns if len(col) == 2 and col.isdigit()], 
-                                var_name='시간', value_name='인원')
-    ml_ready_df['시간'] = ml_ready_df['시간'].astype(int)
-    
-    ml_ready_df = ml_ready_df.pivot_table(index=['날짜', '역명', '요일', 'day_type', '시간', 'days_since_start', '월', 'AvgTemp', 'Rainfall', 'Snow'], 
-                                          columns='유형', values='인원').reset_index().dropna(subset=['역명', '요일'])
-    ml_ready_df[['승차', '하차']] = ml_ready_df[['승차', '하차']].fillna(0).astype(int)
+    rows = has_weather[day_idx]
+    order = np.lexsort((traffic_df['hour'].to_numpy()[keep][rows], station_code[rows], day_idx[rows]))
+    d_idx = day_idx[rows][order]
+    first_day = days[has_weather][0] if has_weather.any() else None
 
+    ml_ready_df = pd.DataFrame({
+        '날짜': pd.to_datetime(days[d_idx]),
+        '역명': pd.Categorical.from_codes(station_code[rows][order], station_names),
+        '요일': pd.Categorical.from_codes(dow[d_idx], DOW_NAMES),
+        'day_type': pd.Categorical.from_codes(day_type[d_idx], DAY_TYPES),
+        '시간': traffic_df['hour'].to_numpy()[keep][rows][order].astype(np.int64),
+        'days_since_start': (days[d_idx] - first_day).astype(np.int64) if first_day is not None else np.zeros(0, np.int64),
+        '월': pd.DatetimeIndex(days).month.to_numpy()[d_idx],
+    })
+    for i, col in enumerate(WEATHER_FEATURES):
+        ml_ready_df[col] = weather[d_idx, i]
+    ml_ready_df['승차'] = traffic_df['board'].to_numpy()[keep][rows][order].astype(int)
+    ml_ready_df['하차'] = traffic_df['alight'].to_numpy()[keep][rows][order].astype(int)
     return ml_ready_df
 
 # --- 3. ML 학습 및 예측 ---
 
-def train_and_predict(df):
-    categorical_features = ['역명', '시간', '월']
-    # [V4 변경점]: 날씨 데이터를 수치형 특성(numerical_features)에 추가
-    numerical_features = ['days_since_start', 'AvgTemp', 'Rainfall', 'Snow']
-    
-    preprocessor = ColumnTransformer(transformers=[
-        ('num', 'passthrough', numerical_features), 
-        ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=False), categorical_features)
+CATEGORICAL_FEATURES = ['역명', '시간', '월']
+# [V4 변경점]: 날씨 데이터를 수치형 특성(numerical_features)에 추가
+NUMERICAL_FEATURES = ['days_since_start', 'AvgTemp', 'Rainfall', 'Snow']
+MODEL_TYPES = ['월', '화', '수', '목', '금', '토', '일', '공휴일']
+TARGETS = ['승차', '하차']
+MIN_TRAIN_ROWS = 100
+# True: 일자 유형마다 승차/하차를 같이 예측하는 다중 출력 forest 1개 (전처리도 한 번만)
+# False: 예전 방식 (일자 유형마다 승차, 하차 파이프라인 2개)
+MULTI_OUTPUT = True
+# 학습 엔진: 'forest' (RandomForest, 원-핫 특성) / 'hgb' (HistGradientBoosting, 역명/시간/월을 범주형 그대로)
+MODEL_ENGINE = 'forest'
+# hgb 범주형 특성의 고정 범주 (학습/예측에서 같은 코드를 쓰도록)
+HGB_CATEGORIES = {'역명': sorted(set(STATION_MAP.values())), '시간': list(range(24)), '월': list(range(1, 13))}
+
+def make_preprocessor():
+    return ColumnTransformer(transformers=[
+        ('num', 'passthrough', NUMERICAL_FEATURES), 
+        ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=False), CATEGORICAL_FEATURES)
     ])
-    
-    def create_pipeline(): 
-        return Pipeline(steps=[
-            ('preprocessor', preprocessor), 
-            ('regressor', RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1, min_samples_leaf=2))
-        ])
-        
-    model_types = ['월', '화', '수', '목', '금', '토', '일', '공휴일']
+
+def hgb_matrix(X_df):
+    """HistGradientBoosting 입력 행렬: 수치형 특성 + 범주형 특성의 정수 코드 (범주에 없으면 NaN = 결측 취급)"""
+    cols = [X_df[f].to_numpy(dtype=np.float64) for f in NUMERICAL_FEATURES]
+    for f in CATEGORICAL_FEATURES:
+        codes = pd.Categorical(X_df[f].astype(object), categories=HGB_CATEGORIES[f]).codes.astype(np.float64)
+        codes[codes < 0] = np.nan
+        cols.append(codes)
+    return np.column_stack(cols)
+
+def fit_day_type_models(df, multi_output=MULTI_OUTPUT, rf_params=None, engine=MODEL_ENGINE, hgb_params=None):
+    """
+    일자 유형별 모델 학습.
+    forest, multi_output=True : {'preprocessor': 전체 데이터로 한 번 fit한 전처리, day_type: forest([승차, 하차])}
+    forest, multi_output=False: {'<day_type>_승차': Pipeline, '<day_type>_하차': Pipeline}
+    hgb (단일 출력만 지원)     : {'engine': 'hgb', '<day_type>_승차': 모델, '<day_type>_하차': 모델}
+    """
+    rf_params = RF_PARAMS if rf_params is None else rf_params
+    features = NUMERICAL_FEATURES + CATEGORICAL_FEATURES
     models = {}
-    
+    if engine == 'hgb':
+        hgb_params = HGB_PARAMS if hgb_params is None else hgb_params
+        X_all = hgb_matrix(df)
+        is_cat = [False] * len(NUMERICAL_FEATURES) + [True] * len(CATEGORICAL_FEATURES)
+        models['engine'] = 'hgb'
+        for day_type in MODEL_TYPES:
+            mask = (df['day_type'] == day_type).to_numpy()
+            if mask.sum() < MIN_TRAIN_ROWS: 
+                print(f"Skipping training for {day_type} (Insufficient data: {int(mask.sum())})")
+                continue
+            for target in TARGETS:
+                models[f'{day_type}_{target}'] = HistGradientBoostingRegressor(
+                    categorical_features=is_cat, **hgb_params).fit(X_all[mask], df.loc[mask, target].to_numpy())
+        return models
+    if engine != 'forest':
+        raise ValueError(f"Unknown model engine: {engine}")
+
+    if multi_output:
+        preprocessor = make_preprocessor().fit(df[features])
+        X_all = preprocessor.transform(df[features])
+        models['preprocessor'] = preprocessor
+
+    for day_type in MODEL_TYPES:
+        mask = (df['day_type'] == day_type).to_numpy()
+        if mask.sum() < MIN_TRAIN_ROWS: 
+            print(f"Skipping training for {day_type} (Insufficient data: {int(mask.sum())})")
+            continue
+
+        if multi_output:
+            models[day_type] = RandomForestRegressor(**rf_params).fit(X_all[mask], df.loc[mask, TARGETS].to_numpy())
+        else:
+            train_df = df[mask]
+            for target in TARGETS:
+                # 파이프라인마다 전처리 객체를 따로 만듦 (하나를 같이 쓰면 마지막 fit 결과로 덮어써짐)
+                models[f'{day_type}_{target}'] = Pipeline(steps=[
+                    ('preprocessor', make_preprocessor()), 
+                    ('regressor', RandomForestRegressor(**rf_params))
+                ]).fit(train_df[features], train_df[target])
+    return models
+
+def predict_day_type(models, day_type, X_df):
+    """학습된 모델로 [n, 2] (승차, 하차) 예측 (반올림, 0 이상). 해당 유형 모델이 없으면 None"""
+    features = NUMERICAL_FEATURES + CATEGORICAL_FEATURES
+    if models.get('engine') == 'hgb':
+        if f'{day_type}_승차' not in models: return None
+        X = hgb_matrix(X_df)
+        pred = np.column_stack([models[f'{day_type}_{t}'].predict(X) for t in TARGETS])
+    elif 'preprocessor' in models:
+        if day_type not in models: return None
+        pred = models[day_type].predict(models['preprocessor'].transform(X_df[features]))
+    else:
+        if f'{day_type}_승차' not in models: return None
+        pred = np.column_stack([models[f'{day_type}_{t}'].predict(X_df[features]) for t in TARGETS])
+    return np.clip(np.round(pred), 0, None).astype(int)
+
+def train_and_predict(df, multi_output=MULTI_OUTPUT, engine=MODEL_ENGINE):
     future_days_since_start = df['days_since_start'].max()
     current_month = datetime.now().month
 
-    for day_type in model_types:
-        train_df = df[df['day_type'] == day_type].copy()
-        if len(train_df) < 100: 
-            print(f"Skipping training for {day_type} (Insufficient data: {len(train_df)})")
-            continue
-            
-        X_train = train_df[numerical_features + categorical_features]
-        models[f'{day_type}_승차'] = create_pipeline().fit(X_train, train_df['승차'])
-        models[f'{day_type}_하차'] = create_pipeline().fit(X_train, train_df['하차'])
+    # 학습 데이터 + 하이퍼파라미터가 지난 실행과 같으면 모델을 다시 학습하지 않고 불러옴
+    train_cols = ['day_type'] + NUMERICAL_FEATURES + CATEGORICAL_FEATURES + TARGETS
+    params = ({"hgb": HGB_PARAMS, "categories": HGB_CATEGORIES} if engine == 'hgb'
+              else {"rf": RF_PARAMS, "multi_output": multi_output})
+    key = fingerprint(df[train_cols].reset_index(drop=True),
+                      {**params, "engine": engine, "num": NUMERICAL_FEATURES, "cat": CATEGORICAL_FEATURES,
+                       "types": MODEL_TYPES, "min_rows": MIN_TRAIN_ROWS})
+    kind = "day_type_hgb" if engine == 'hgb' else ("day_type_rf_multi" if multi_output else "day_type_rf")
+    models = cached_model(kind, key, lambda: fit_day_type_models(df, multi_output, engine=engine))
         
     # 예측 데이터셋 생성
-    stations = df['역명'].unique()
+    stations = list(df['역명'].unique())
     hours = list(range(24))
     future_X_df = pd.MultiIndex.from_product([stations, hours], names=['역명', '시간']).to_frame(index=False)
     
@@ -176,23 +261,16 @@ def train_and_predict(df):
     future_X_df['Rainfall'] = 0
     future_X_df['Snow'] = 0
     
+    # { 역: { 일자유형: { "HH": {승차, 하차} } } } - 예측 배열을 [역, 시간, 2]로 묶어서 만듦
+    hour_strs = [f"{h:02d}" for h in hours]
     usage_json = {}
-    for day_type in model_types:
-        if f'{day_type}_승차' not in models: continue
-        
-        pred_승차 = np.round(models[f'{day_type}_승차'].predict(future_X_df[numerical_features + categorical_features])).astype(int).clip(lower=0)
-        pred_하차 = np.round(models[f'{day_type}_하차'].predict(future_X_df[numerical_features + categorical_features])).astype(int).clip(lower=0)
-        
-        pred_df = future_X_df.copy()
-        pred_df['예측_승차'] = pred_승차
-        pred_df['예측_하차'] = pred_하차
+    for day_type in MODEL_TYPES:
+        pred = predict_day_type(models, day_type, future_X_df)
+        if pred is None: continue
         
-        for _, row in pred_df.iterrows():
-            station = row['역명']
-            hour_str = str(row['시간']).zfill(2)
-            if station not in usage_json: usage_json[station] = {}
-            if day_type not in usage_json[station]: usage_json[station][day_type] = {}
-            usage_json[station][day_type][hour_str] = {'승차': int(row['예측_승차']), '하차': int(row['예측_하차'])}
+        for station, rows in zip(stations, pred.reshape(len(stations), len(hours), 2).tolist()):
+            usage_json.setdefault(station, {})[day_type] = {
+                h: {'승차': b, '하차': a} for h, (b, a) in zip(hour_strs, rows)}
     
     return usage_json
 
@@ -217,7 +295,7 @@ if __name__ == "__main__":
         print(f"✅ Loaded Weather Data: {len(weather_df)} rows")
 
     try:
-        start_year = traffic_df['일자'].str.slice(0, 4).min()
+        start_year = traffic_df['date'].dt.year.min()
         end_year = str(int(datetime.now().year) + 1)
         holidays_map = get_korean_holidays(int(start_year), int(end_year))
         
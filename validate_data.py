@@ -1,108 +1,153 @@
 import os
+import sys
+import time
+from collections import Counter
+import numpy as np
 import pandas as pd
-import glob
-import re
+from ridership_store import load_ridership, read_file_schema, read_skipped_duplicates, CACHE_DIR
 
 # Goal: Verify data from 2024-12-01 to 2025-11-29 for all 10 stations
 TARGET_START = pd.Timestamp("2024-12-01")
 TARGET_END = pd.Timestamp("2025-11-29")
 STATIONS = ["1.양촌", "2.구래", "3.마산", "4.장기", "5.운양", "6.걸포북변", "7.사우(김포시청)", "8.풍무", "9.고촌", "10.김포공항"]
 
-BASE_DIR = r"c:/Users/박남순/.gemini/antigravity/playground/photonic-cassini/gimpo-goldline/raw_data"
+RAW_DATA_DIR = os.path.join(os.getcwd(), "raw_data")
 
-def check_data():
+# STCIS 시간대: 04시 ~ 다음날 03시 (24개)
+HOURS = 24
+
+# ==============================================================================
+# 적재된 저장소 검증
+# ------------------------------------------------------------------------------
+# (일자 x 역 x 시간) 행 수 배열을 np.bincount 한 번으로 만들고,
+# 존재 여부(>0) / 중복(>1)을 배열 연산으로 봅니다. 원본 CSV는 다시 읽지 않고
+# 적재할 때 기록한 헤더 / 비숫자 칸 수(ridership_store manifest)를 씁니다.
+# [ERROR]가 하나라도 있으면 check_data()는 False를 반환합니다 (빌드 중단용).
+# ==============================================================================
+def build_presence(table, stations, start=None, end=None):
+    """
+    (일자, 역, 시간)별 행 수 배열 [D, S, 24] (uint16)과 일자 축(datetime64[D])을 반환합니다.
+    station은 역명(ridership_store 정제 후), 범위 밖 일자/역/시간은 세지 않습니다.
+    빈 테이블이고 start/end도 없으면 일자 0개 배열을 반환합니다.
+    """
+    dates = table['date'].to_numpy().astype('datetime64[D]')
+    if len(dates) == 0 and (start is None or end is None):
+        return np.zeros((0, len(stations), HOURS), dtype=np.uint16), np.array([], dtype='datetime64[D]')
+    start = np.datetime64(start, 'D') if start is not None else dates.min()
+    end = np.datetime64(end, 'D') if end is not None else dates.max()
+    n_days = int((end - start).astype(np.int64)) + 1
+
+    station_code = pd.Categorical(table['station'].astype(str), categories=stations).codes
+    day = (dates - start).astype(np.int64)
+    hour = table['hour'].to_numpy().astype(np.int64)
+    ok = (station_code >= 0) & (day >= 0) & (day < n_days) & (hour >= 0) & (hour < HOURS)
+
+    flat = (day[ok] * len(stations) + station_code[ok]) * HOURS + hour[ok]
+    counts = np.bincount(flat, minlength=n_days * len(stations) * HOURS)
+    counts = counts.reshape(n_days, len(stations), HOURS).astype(np.uint16)
+    return counts, start + np.arange(n_days)
+
+
+def _header_drift(schema, headers):
+    """가장 많은 파일이 쓰는 헤더를 기준으로 다른 헤더를 쓰는 파일과 차이 컬럼"""
+    if not schema:
+        return []
+    usage = Counter(info['header'] for info in schema.values())
+    base_key = usage.most_common(1)[0][0]
+    base = headers.get(base_key, [])
+    lines = []
+    for key, n_files in usage.items():
+        if key == base_key:
+            continue
+        cols = headers.get(key, [])
+        files = sorted(rel for rel, info in schema.items() if info['header'] == key)
+        missing = [c for c in base if c not in cols]
+        extra = [c for c in cols if c not in base]
+        detail = f"-{missing[:3]} +{extra[:3]}" if (missing or extra) else "컬럼 순서 다름"
+        lines.append(f"[ERROR][HEADER DRIFT] {n_files}개 파일 ({files[0]} 등): {detail}")
+    return lines
+
+
+def check_data(raw_dir=RAW_DATA_DIR, cache_dir=CACHE_DIR, workers=None):
     report = []
-    
+    t0 = time.time()
+    table = load_ridership(raw_dir, cache_dir, workers, dedup=False)
+    t_load = time.time() - t0
+
+    t0 = time.time()
+    names = [station.split('.', 1)[1] for station in STATIONS]
     for station in STATIONS:
-        print(f"Checking {station}...")
-        station_path = os.path.join(BASE_DIR, station)
-        if not os.path.exists(station_path):
+        if not os.path.exists(os.path.join(raw_dir, station)):
             report.append(f"[MISSING] Station folder not found: {station}")
-            continue
-            
-        all_files = glob.glob(os.path.join(station_path, "*.csv"))
-        if not all_files:
-             # Try .xls or .xlsx if STCIS default download
-            all_files = glob.glob(os.path.join(station_path, "*.xls*"))
-            
-        if not all_files:
-            report.append(f"[EMPTY] No files in {station}")
-            continue
 
-        # Load all dates from all files to check for gaps
-        collected_dates = set()
-        
-        for f in all_files:
-            try:
-                # STCIS usually gives XLS but extension might be CSV or XLS. 
-                # Let's try reading as CSV first, if fail, read as Excel.
-                # It often ignores extension.
-                try:
-                    df = pd.read_csv(f, encoding='cp949') 
-                except:
-                    # Sometimes headers are messy, try reading without header then assigning
-                    try:
-                         df = pd.read_csv(f, encoding='cp949', header=None, skiprows=1)
-                    except:
-                         df = pd.read_excel(f)
-
-                # Inspect columns. If header is garbled, use index.
-                # In the sample: Col 0=Station, Col 1=?, Col 2=Date
-                date_col_name = None
-                
-                # Check based on sample content (YYYY-MM-DD)
-                for col in df.columns:
-                    sample = str(df[col].iloc[0])
-                    if re.search(r'\d{4}-\d{2}-\d{2}', sample):
-                        date_col_name = col
-                        break
-                
-                if date_col_name is None:
-                    # Fallback to 3rd column (index 2)
-                    if len(df.columns) > 2:
-                        date_col_name = df.columns[2]
-                
-                if date_col_name is None:
-                     report.append(f"[FORMAT] Could not find Date column in {os.path.basename(f)}")
-                     continue
-                
-                # Clean date string: Remove (월), (화) etc.
-                raw_dates = df[date_col_name].astype(str).str.split('(').str[0]
-                dates = pd.to_datetime(raw_dates, errors='coerce').dropna()
-                
-                # Filter weird dates (e.g. 1900s if excel default)
-                dates = dates[dates.dt.year > 2000]
-                
-                collected_dates.update(dates)
-                
-            except Exception as e:
-                report.append(f"[ERROR] Reading {os.path.basename(f)}: {e}")
-        
-        if not collected_dates:
-             report.append(f"[NO DATA] Valid dates not found in {station}")
-             continue
-             
-        min_date = min(collected_dates)
-        max_date = max(collected_dates)
-        
-        # Check coverage
+    if table.empty:
+        report.append(f"[ERROR][NO DATA] CSV 파일 없음 ({raw_dir})")
+
+    counts, days = build_presence(table, names)
+    present = counts > 0
+    day_present = present.any(axis=2)                      # [D, S]
+
+    # 1. 역별 기간 / 빠진 일자
+    for s, station in enumerate(STATIONS):
+        got = np.flatnonzero(day_present[:, s])
+        if len(got) == 0:
+            report.append(f"[EMPTY] No rows for {station}")
+            continue
+        min_date, max_date = pd.Timestamp(days[got[0]]), pd.Timestamp(days[got[-1]])
         if min_date > TARGET_START:
-             report.append(f"[GAP START] {station}: Starts at {min_date.date()} (Expected {TARGET_START.date()})")
+            report.append(f"[GAP START] {station}: Starts at {min_date.date()} (Expected {TARGET_START.date()})")
         if max_date < TARGET_END:
-             report.append(f"[GAP END] {station}: Ends at {max_date.date()} (Expected {TARGET_END.date()})")
-             
-        # Check for missing days in between
-        full_range = pd.date_range(start=max(min_date, TARGET_START), end=min(max_date, TARGET_END))
-        missing = [d for d in full_range if d not in collected_dates]
-        if missing:
-            report.append(f"[MISSING DAYS] {station}: {len(missing)} days missing (e.g., {missing[0].date()})")
+            report.append(f"[GAP END] {station}: Ends at {max_date.date()} (Expected {TARGET_END.date()})")
+
+        lo = max(got[0], int((np.datetime64(TARGET_START, 'D') - days[0]).astype(np.int64)))
+        hi = min(got[-1], int((np.datetime64(TARGET_END, 'D') - days[0]).astype(np.int64)))
+        missing = lo + np.flatnonzero(~day_present[lo:hi + 1, s]) if hi >= lo else np.array([], dtype=int)
+        if len(missing):
+            report.append(f"[MISSING DAYS] {station}: {len(missing)} days missing (e.g., {days[missing[0]]})")
         else:
             report.append(f"[OK] {station}: {min_date.date()} ~ {max_date.date()} (Complete)")
 
+    # 2. 있는 날인데 빠진 시간대
+    hour_gaps = day_present[:, :, None] & ~present
+    if hour_gaps.any():
+        d, s, h = np.argwhere(hour_gaps)[0]
+        report.append(f"[MISSING HOURS] {int(hour_gaps.sum())}개 (일자, 역, 시간) 비어 있음 "
+                      f"(e.g., {days[d]} {STATIONS[s]} {h:02d}시)")
+
+    # 3. 중복 행 (같은 (일자, 역, 시간)이 두 번 이상) / 내용이 같은 파일
+    dup = counts > 1
+    if dup.any():
+        d, s, h = np.argwhere(dup)[0]
+        report.append(f"[DUPLICATE ROWS] {int((counts[dup] - 1).sum())}행이 {int(dup.sum())}개 (일자, 역, 시간)에 겹침 "
+                      f"(e.g., {days[d]} {STATIONS[s]} {h:02d}시) - 적재 시 최신 export 기준으로 정리됨")
+    skipped = read_skipped_duplicates(cache_dir)
+    if skipped:
+        report.append(f"[DUPLICATE FILES] 내용이 같은 파일 {len(skipped)}개는 적재하지 않음")
+
+    # 4. 음수 / 숫자가 아닌 승하차 값
+    negative = (table['board'].to_numpy() < 0) | (table['alight'].to_numpy() < 0)
+    if negative.any():
+        files = table['file'][negative].value_counts()
+        files = files[files > 0]
+        report.append(f"[ERROR][NEGATIVE] 음수 승하차 {int(negative.sum())}행 ({files.index[0]} 등 {len(files)}개 파일)")
+
+    schema, headers = read_file_schema(cache_dir)
+    nonnumeric = {rel: info['nonnumeric'] for rel, info in schema.items() if info['nonnumeric']}
+    if nonnumeric:
+        worst = max(nonnumeric, key=nonnumeric.get)
+        report.append(f"[ERROR][NON-NUMERIC] 숫자가 아니거나 빈 승하차 칸 {sum(nonnumeric.values())}개 "
+                      f"({worst} 등 {len(nonnumeric)}개 파일, 0으로 적재됨)")
+
+    # 5. 헤더 변경
+    report.extend(_header_drift(schema, headers))
+    t_check = time.time() - t0
+
     print("\nXXX REPORT START XXX")
     for r in report:
         print(r)
+    print(f"(load {t_load * 1000:.0f} ms, check {t_check * 1000:.0f} ms)")
     print("XXX REPORT END XXX")
+    return not any(r.startswith("[ERROR]") for r in report)
 
 if __name__ == "__main__":
-    check_data()
+    sys.exit(0 if check_data() else 1)
@@ -24,6 +24,7 @@ def predict(target_date_str, target_weather, station, hour):
     similar_days = []
     
     for k, day_data in db.items():
+        if 'meta' not in day_data: continue # 최상위 ml_model 등 날짜가 아닌 키
         score = 0
         meta = day_data['meta']
         
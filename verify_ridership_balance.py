@@ -1,69 +1,22 @@
 import os
-import glob
-import pandas as pd
-import re
+from ridership_store import load_ridership
 
 RAW_DATA_DIR = os.path.join(os.getcwd(), "raw_data")
 
 def analyze_ridership():
     print("running analysis...")
-    csv_files = glob.glob(os.path.join(RAW_DATA_DIR, "**", "*.csv"), recursive=True)
-    if not csv_files:
+    table = load_ridership(RAW_DATA_DIR)
+    if table.empty:
         print("No CSV files found.")
         return
 
-    station_stats = {}
-    total_board_sum = 0
-    total_alight_sum = 0
-    
-    # Track daily totals to spot specific days with huge gaps
-    daily_stats = {}
-
-    for fpath in csv_files:
-        try:
-            df = pd.read_csv(fpath, encoding='cp949')
-            # Assuming standard structure: Station, Line, Date, 05-Board, 05-Alight, ...
-            
-            for index, row in df.iterrows():
-                try:
-                    station = str(row.iloc[0]).split('[')[0].strip()
-                    if station == "nan": continue
-                    
-                    # Sum all boarding/alighting columns
-                    daily_board = 0
-                    daily_alight = 0
-                    
-                    col_idx = 3
-                    while col_idx < len(df.columns) - 1:
-                         # Check if column header has digit (hour)
-                        if not re.search(r'(\d+)', str(df.columns[col_idx])): 
-                            col_idx += 2; continue
-                        
-                        try:
-                            b = int(row.iloc[col_idx])
-                            a = int(row.iloc[col_idx+1])
-                        except:
-                            b=0; a=0
-                        
-                        daily_board += b
-                        daily_alight += a
-                        col_idx += 2
-                    
-                    if station not in station_stats:
-                        station_stats[station] = {'board': 0, 'alight': 0}
-                    
-                    station_stats[station]['board'] += daily_board
-                    station_stats[station]['alight'] += daily_alight
-                    
-                    total_board_sum += daily_board
-                    total_alight_sum += daily_alight
-                    
-                except Exception as e:
-                    # print(f"Row error: {e}")
-                    continue
-        except Exception as e:
-            print(f"File error {fpath}: {e}")
-            continue
+    sums = table.groupby('station', observed=True)[['board', 'alight']].sum()
+    station_stats = {
+        st: {'board': int(b), 'alight': int(a)}
+        for st, b, a in zip(sums.index, sums['board'], sums['alight'])
+    }
+    total_board_sum = int(sums['board'].sum())
+    total_alight_sum = int(sums['alight'].sum())
 
     print(f"\n{'='*50}")
     print(f"📊 Raw Ridership Analysis Code")